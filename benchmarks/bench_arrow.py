@@ -0,0 +1,39 @@
+"""
+Wall time of `caelus.classify` on an Arrow Table (and a Polars DataFrame) with a
+year of 1-min data, against its conversion to a Pandas DataFrame with a
+DatetimeIndex before `caelus.classify`, and check that the result is the same.
+
+Usage: python benchmarks/bench_arrow.py
+"""
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    data = synthetic_data()
+    # NaN (not nulls) in the missing data, as produced by most ingestion pipelines
+    table = pa.table({
+        'time': pa.array(data.index.values),
+        **{name: pa.array(data[name].to_numpy()) for name in data.columns}
+    })
+    frame = pl.from_arrow(table)
+
+    def classify_pandas():
+        return caelus.classify(table.to_pandas().set_index('time')).to_numpy()
+
+    same = np.array_equal(classify_pandas(), caelus.classify(table).to_numpy())
+    print(f'{table.num_rows} time steps')
+    print(f'to_pandas + classify: {timeit(classify_pandas):8.3f} s')
+    print(f'classify(Arrow):      {timeit(caelus.classify, table):8.3f} s '
+          f'(same result: {same})')
+    print(f'classify(Polars):     {timeit(caelus.classify, frame):8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Wall time of `caelus.classify` and `caelus.classify_array` on a year of 1-min data,
+and memory of their output (with and without `compact=True`).
+
+Usage: python benchmarks/bench_classify.py [site year]
+
+Without arguments, a synthetic year of data is used. Otherwise, the site-year is
+loaded (and downloaded, if needed) with `caelus.data.load`.
+"""
+
+import sys
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def mebibytes(output):
+    # memory of the values of a Series or DataFrame, in MiB
+    return np.sum(output.memory_usage(index=False)) / 2**20
+
+
+def main():
+    if len(sys.argv) == 3:
+        data = caelus.data.load(sys.argv[1], int(sys.argv[2]))
+    else:
+        data = synthetic_data()
+
+    arrays = [data.index.values] + [
+        data[name].to_numpy() for name in ('sza', 'eth', 'ghi', 'ghics', 'ghicda')]
+    longitude = data['longitude'].to_numpy()
+
+    print(f'{len(data)} time steps')
+    print(f'classify:              {timeit(caelus.classify, data):8.3f} s')
+    print(f'classify_array:        {timeit(caelus.classify_array, *arrays, longitude):8.3f} s')
+
+    # most of the night time work: the ghi mirroring
+    elapsed = timeit(caelus.classifier.ghi_mirroring, data)
+    print(f'  ghi mirroring:          {elapsed:8.3f} s')
+
+    # the classification engine alone: no ghi mirroring and no cleaning filters
+    config = caelus.ClassifierConfig().replace(
+        clean_spurious_sky_patches=False,
+        clean_scatter_clouds_flanked_by_thin_clouds=False,
+        clean_cloudless_to_thin_clouds_transitions=False,
+        clean_thin_clouds_to_scatter_clouds_transitions=False
+    )
+    elapsed = timeit(
+        caelus.classify_array, *arrays, enable_ghi_mirroring=False, config=config)
+    print(f'  indices and thresholds: {elapsed:8.3f} s')
+
+    for full_output in (False, True):
+        sizes = [
+            mebibytes(caelus.classify(data, full_output=full_output, compact=compact))
+            for compact in (False, True)
+        ]
+        print(f'output (full_output={full_output!s:5}): {sizes[0]:6.1f} MiB, '
+              f'{sizes[1]:6.1f} MiB with compact=True')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Wall time of the classification of a synthetic (time, lat, lon) cube of 1-min data
+with `caelus.classify_cube` (dask), against one call of `caelus.classify` per
+pixel, and check that the result is the same.
+
+Usage: python benchmarks/bench_cube.py [n_lat n_lon [days]]
+"""
+
+import sys
+
+import numpy as np
+import xarray as xr
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def synthetic_cube(n_lat, n_lon, days):
+    lats = np.linspace(-50., 50., n_lat)
+    lons = np.linspace(-170., 170., n_lon)
+    pixels = [
+        synthetic_data(days=days, latitude=lat, longitude=lon, seed=seed)
+        for seed, (lat, lon) in enumerate(
+            (lat, lon) for lat in lats for lon in lons)
+    ]
+    variables = {
+        name: (('time', 'lat', 'lon'), np.stack(
+            [data[name].to_numpy() for data in pixels], axis=-1).reshape(-1, n_lat, n_lon))
+        for name in ('sza', 'eth', 'ghi', 'ghics', 'ghicda')
+    }
+    coords = {'time': pixels[0].index.values, 'lat': lats, 'lon': lons}
+    return xr.Dataset(variables, coords=coords).assign_coords(longitude=('lon', lons)), pixels
+
+
+def main():
+    n_lat = int(sys.argv[1]) if len(sys.argv) > 2 else 8
+    n_lon = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    cube, pixels = synthetic_cube(n_lat, n_lon, days)
+    cube = cube.chunk({'time': 8 * 4096})
+
+    def classify_loop():
+        return np.stack([caelus.classify(data).to_numpy() for data in pixels], axis=-1)
+
+    def classify_cube():
+        return caelus.classify_cube(cube).values
+
+    same = np.array_equal(
+        classify_loop().reshape(-1, n_lat, n_lon), classify_cube())
+    print(f'{n_lat} x {n_lon} pixels x {cube.sizes["time"]} time steps')
+    print(f'classify loop:  {timeit(classify_loop):8.3f} s')
+    print(f'classify_cube:  {timeit(classify_cube):8.3f} s (same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Wall time of `caelus.classify` on a dask DataFrame (e.g., a partitioned Parquet
+archive) with monthly partitions, against the classification of the whole series
+in memory, and check that the result is the same.
+
+Usage: python benchmarks/bench_dask.py [years [scheduler]]
+"""
+
+import sys
+
+import dask.dataframe as dd
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    scheduler = sys.argv[2] if len(sys.argv) > 2 else 'threads'
+
+    data = synthetic_data(days=365 * years)
+    partitions = dd.from_pandas(data, npartitions=12 * years)
+    reference = caelus.classify(data)
+
+    def classify_dask():
+        return caelus.classify(partitions).compute(scheduler=scheduler)
+
+    same = classify_dask().equals(reference)
+    print(f'{len(data)} time steps, {partitions.npartitions} partitions')
+    print(f'in memory: {timeit(caelus.classify, data, repeat=1):8.3f} s')
+    print(f'dask ({scheduler}): {timeit(classify_dask, repeat=1):8.3f} s (same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Latency of repeated classifications of a sliding window of a few days of 1-min
+data (e.g., a service that classifies the last days of a site every hour), with
+`caelus.classify_array` and with a `caelus.Classifier`, which writes the sky
+types into the same array at every call.
+
+For each one, it prints the percentiles of the wall time per call (with the
+calls of both interleaved) and the peak of new memory per call (median and max.),
+traced by tracemalloc in a separate run, since it slows down the calls. NumPy has
+no counter of allocations, but the peak is the size of the largest set of arrays
+alive at once during the call.
+
+Usage: python benchmarks/bench_latency.py [days [n_calls]]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data
+
+
+def latencies(methods, windows, repeat=3):
+    # wall times (in s) of the calls to each method(*arrays) for the arrays of each
+    # window, `repeat` times. The methods are interleaved, so that they run in
+    # the same state of the machine
+    elapsed = {name: [] for name in methods}
+    for _ in range(repeat):
+        for arrays in windows:
+            for name, classify in methods.items():
+                start = time.perf_counter()
+                classify(*arrays)
+                elapsed[name].append(time.perf_counter() - start)
+    return {name: np.array(times) for name, times in elapsed.items()}
+
+
+def memory_peaks(classify, windows):
+    # peaks of new memory (in bytes) of the calls to classify(*arrays)
+    peaks = []
+    tracemalloc.start()
+    for arrays in windows:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        classify(*arrays)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return np.array(peaks)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    n_calls = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    data = synthetic_data(days=days + n_calls // 24 + 1)
+    n_times = days * 1440
+    arrays = [data.index.values] + [
+        data[name].to_numpy() for name in ('sza', 'eth', 'ghi', 'ghics', 'ghicda', 'longitude')]
+    windows = [
+        [x[start:start + n_times] for x in arrays]
+        for start in range(0, 60 * n_calls, 60)
+    ]
+
+    classifier = caelus.Classifier()
+    sky_type = np.empty(n_times, dtype=np.uint8)
+
+    def classify_reused(*arrays):
+        return classifier.classify_array(*arrays, out=sky_type)
+
+    same = all(
+        np.array_equal(caelus.classify_array(*arrays), classify_reused(*arrays))
+        for arrays in windows[:10]
+    )
+    print(f'{n_calls} windows of {days} days ({n_times} time steps), same result: {same}')
+    methods = {'classify_array': caelus.classify_array, 'Classifier': classify_reused}
+    elapsed = latencies(methods, windows)
+    print('                       p50 ms   p90 ms   p99 ms   peak new KiB (max.)')
+    for name, classify in methods.items():
+        p50, p90, p99 = np.percentile(elapsed[name], [50, 90, 99]) * 1e3
+        peaks = memory_peaks(classify, windows)
+        print(f'{name:20s} {p50:8.2f} {p90:8.2f} {p99:8.2f} {np.median(peaks) / 2**10:14.1f} '
+              f'({np.max(peaks) / 2**10:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Wall time of the classification of many site-years of 1-min data with
+`caelus.classify_many` (shared memory and a persistent pool of processes), against
+a pool of processes that takes a pickled copy of each DataFrame (the usual
+multiprocessing pattern), and check that the result is the same.
+
+Usage: python benchmarks/bench_many.py [n_series [n_jobs]]
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    datasets = [
+        synthetic_data(latitude=latitude, seed=seed)
+        for seed, latitude in enumerate(np.linspace(-50., 50., n_series))
+    ]
+
+    def classify_pickled():
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(caelus.classify, datasets))
+
+    def classify_many():
+        return caelus.classify_many(datasets, n_jobs=n_jobs)
+
+    same = all(a.equals(b) for a, b in zip(classify_pickled(), classify_many()))
+    print(f'{n_series} series of {len(datasets[0])} time steps, {n_jobs} processes')
+    print(f'pickled DataFrames: {timeit(classify_pickled):8.3f} s')
+    print(f'classify_many:      {timeit(classify_many):8.3f} s (same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Wall time of the classification of a panel of sites on the same 1-min time grid:
+one call of `caelus.classify` per site, against `caelus.classify_panel` on the
+(sites x time) arrays, and check that the result is the same.
+
+Usage: python benchmarks/bench_panel.py [n_sites [days]]
+"""
+
+import sys
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    sites = [
+        synthetic_data(days=days, latitude=latitude, longitude=longitude, seed=seed)
+        for seed, (latitude, longitude) in enumerate(zip(
+            np.linspace(-60., 60., n_sites), np.linspace(-170., 170., n_sites)))
+    ]
+    times = sites[0].index.values
+    arrays = {
+        name: np.array([data[name].to_numpy() for data in sites])
+        for name in ('sza', 'eth', 'ghi', 'ghics', 'ghicda')
+    }
+    longitude = np.array([data['longitude'].iloc[0] for data in sites])
+
+    def classify_loop():
+        return np.array([caelus.classify(data).to_numpy() for data in sites])
+
+    def classify_panel():
+        return caelus.classify_panel(times, **arrays, longitude=longitude)
+
+    same = np.array_equal(classify_loop(), classify_panel())
+    print(f'{n_sites} sites x {len(times)} time steps')
+    print(f'classify loop:  {timeit(classify_loop):8.3f} s')
+    print(f'classify_panel: {timeit(classify_panel):8.3f} s (same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
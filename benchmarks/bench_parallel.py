@@ -0,0 +1,34 @@
+"""
+Wall time of `caelus.classify` with several worker processes (n_jobs), on a
+multi-year synthetic series of 1-min data, and check that the result is the same
+as with a single process.
+
+Usage: python benchmarks/bench_parallel.py [years [n_jobs ...]]
+"""
+
+import sys
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    all_n_jobs = [int(n) for n in sys.argv[2:]] or [2, 4, -1]
+
+    data = synthetic_data(days=365 * years)
+    reference = caelus.classify(data).to_numpy()
+
+    print(f'{len(data)} time steps')
+    print(f'n_jobs=None: {timeit(caelus.classify, data, repeat=1):8.3f} s')
+    for n_jobs in all_n_jobs:
+        elapsed = timeit(caelus.classify, data, n_jobs=n_jobs, repeat=1)
+        same = np.array_equal(caelus.classify(data, n_jobs=n_jobs).to_numpy(), reference)
+        print(f'n_jobs={n_jobs}: {elapsed:11.3f} s (same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
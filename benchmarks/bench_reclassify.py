@@ -0,0 +1,43 @@
+"""
+Wall time of the reclassification of a year of 1-min data after the correction of
+a few hours of ghi, with `caelus.reclassify` (only the affected time steps) and
+with `caelus.classify` (the whole year), and check that the result is the same.
+
+Usage: python benchmarks/bench_reclassify.py [n_corrections]
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    n_corrections = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    data = synthetic_data()
+    previous = caelus.classify(data, full_output=True)
+
+    # a few hours of ghi scaled down, at random times of the year
+    rng = np.random.default_rng(0)
+    corrected = data.copy()
+    modified = []
+    for start in rng.choice(data.index[:-300], n_corrections, replace=False):
+        end = start + pd.Timedelta(int(rng.integers(60, 300)), 'min')
+        corrected.loc[start:end, 'ghi'] *= 0.8
+        modified.append((start, end))
+
+    result = caelus.reclassify(corrected, previous, modified)
+    same = result.equals(caelus.classify(corrected, full_output=True))
+    print(f'{len(data)} time steps, {n_corrections} corrections')
+    print(f'classify:   {timeit(caelus.classify, corrected, full_output=True):8.3f} s')
+    print(f'reclassify: {timeit(caelus.reclassify, corrected, previous, modified):8.3f} s '
+          f'(same result: {same})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Wall time of the regularization of 1-s data (with gaps and duplicate time stamps)
+to the 1-min grid of the classification with `caelus.regularize`, against pandas'
+resample (mean and count of valid values, for the same gap masking), and check
+that the result is the same.
+
+Usage: python benchmarks/bench_regularize.py [days]
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+
+    data = synthetic_data(days=days, freq='1s')
+    rng = np.random.default_rng(0)
+    data = data.drop(data.index[rng.choice(len(data), len(data) // 20, replace=False)])
+    data = pd.concat([data, data.iloc[rng.choice(len(data), 1000)]]).sort_index()
+
+    def regularize_pandas():
+        unique = data[~data.index.duplicated()]
+        resampler = unique.resample('1min')
+        return resampler.mean().where(resampler.count() >= 30)
+
+    result = caelus.regularize(data)
+    expected = regularize_pandas().reindex(result.index)
+    same = np.allclose(result, expected, rtol=1e-12, atol=1e-9, equal_nan=True)
+    print(f'{len(data)} time stamps, {len(result)} time steps')
+    print(f'pandas resample:  {timeit(regularize_pandas):8.3f} s')
+    print(f'regularize:       {timeit(caelus.regularize, data):8.3f} s (same result: {same})')
+    print(f'classify:         {timeit(caelus.classify, result):8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Wall time of a threshold sweep on a year of synthetic 1-min data: one call of
+`caelus.classify` per config, against the indices computed once with
+`caelus.VariabilityIndices` and all the configs evaluated with its `sweep`. And
+the same for a sweep of the window lengths, with the indices of all the windows
+computed at once with `VariabilityIndices.from_windows`.
+
+Usage: python benchmarks/bench_sweep.py [n_values]
+
+The sweep is the grid of `n_values` (3 by default) values of three thresholds, and
+of the two window lengths.
+"""
+
+import sys
+
+import numpy as np
+
+import caelus
+
+from common import synthetic_data, timeit
+
+
+def main():
+    n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    data = synthetic_data()
+    configs = caelus.config_grid(
+        cloudless_max_kv=np.linspace(0.02, 0.04, n_values),
+        overcast_max_km=np.linspace(0.25, 0.35, n_values),
+        thickclouds_max_kv=np.linspace(0.14, 0.18, n_values)
+    )
+
+    def classify_loop():
+        return [caelus.classify(data, config=config) for config in configs]
+
+    def sweep():
+        indices = caelus.VariabilityIndices.from_data(data)
+        return indices.sweep(configs, output='frequencies')
+
+    print(f'{len(data)} time steps, {len(configs)} configs')
+    print(f'classify loop: {timeit(classify_loop, repeat=1):8.3f} s')
+    print(f'sweep:         {timeit(sweep, repeat=1):8.3f} s')
+
+    dt = [f'{minutes}min' for minutes in np.linspace(20, 40, n_values).round().astype(int)]
+    dt_f = [f'{minutes}min' for minutes in np.linspace(5, 15, n_values).round().astype(int)]
+    configs = [caelus.ClassifierConfig(dt=dt_, dt_f=dt_f_) for dt_ in dt for dt_f_ in dt_f]
+
+    def window_loop():
+        return [caelus.classify(data, config=config) for config in configs]
+
+    def window_sweep():
+        indices = caelus.VariabilityIndices.from_windows(data, dt, dt_f)
+        return [indices_.classify() for indices_ in indices.values()]
+
+    print(f'{len(configs)} window configs')
+    print(f'classify loop: {timeit(window_loop, repeat=1):8.3f} s')
+    print(f'from_windows:  {timeit(window_sweep, repeat=1):8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
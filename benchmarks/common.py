@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_data(start='2014-01-01 00:00:30', days=365, latitude=44.083,
+                   longitude=5.059, freq='1min', seed=0):
+    """
+    Synthetic 1-min time series with the variables required by `caelus.classify`.
+
+    The solar geometry comes from Spencer's formulas and the cloudiness is simulated
+    as a sequence of random sky regimes (from cloudless to overcast, including cloud
+    enhancements), with some data gaps. It is meant only for benchmarking: use
+    `caelus.data.load` to get real data.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=int(pd.Timedelta(days, 'D') / pd.Timedelta(freq)),
+                          freq=freq)
+    n_times = len(times)
+
+    hours = times.hour.values + times.minute.values / 60 + times.second.values / 3600
+    gamma = 2 * np.pi * (times.day_of_year.values - 1 + hours / 24) / 365
+    declination = (
+        0.006918 - 0.399912*np.cos(gamma) + 0.070257*np.sin(gamma)
+        - 0.006758*np.cos(2*gamma) + 0.000907*np.sin(2*gamma)
+        - 0.002697*np.cos(3*gamma) + 0.00148*np.sin(3*gamma))
+    eot = 229.18 * (
+        0.000075 + 0.001868*np.cos(gamma) - 0.032077*np.sin(gamma)
+        - 0.014615*np.cos(2*gamma) - 0.040849*np.sin(2*gamma))  # minutes
+    hour_angle = np.radians((hours * 60 + 4 * longitude + eot) / 4 - 180)
+    lat = np.radians(latitude)
+    cosz = (np.sin(lat) * np.sin(declination) +
+            np.cos(lat) * np.cos(declination) * np.cos(hour_angle))
+
+    mu0 = cosz.clip(0.)
+    e0 = 1361. * (1 + 0.033 * np.cos(gamma))
+    ghicda = 0.85 * e0 * mu0**1.15
+    ghics = 0.78 * e0 * mu0**1.20
+
+    # random sequence of sky regimes...
+    lengths = rng.integers(5, 240, size=n_times // 5 + 1)
+    regimes = rng.choice(6, size=lengths.size, p=[0.25, 0.15, 0.2, 0.15, 0.15, 0.1])
+    regime = np.repeat(regimes, lengths)[:n_times]
+
+    noise = rng.standard_normal(n_times)
+    walk = np.convolve(rng.standard_normal(n_times), np.ones(7) / 7, mode='same')
+    kc = np.select(
+        [regime == 0, regime == 1, regime == 2, regime == 3, regime == 4],
+        [1.0 + 0.0005*noise, 0.95 + 0.015*walk, 0.7 + 0.35*walk,
+         0.35 + 0.12*walk, 0.2 + 0.02*noise],
+        1.05 + 0.3*np.abs(walk)
+    )
+    ghi = np.where(cosz > 0, (kc * ghics).clip(0.), 0.)
+    ghi = np.round(ghi + rng.integers(-1, 2, n_times) * (cosz > 0) * (rng.random(n_times) < 0.2))
+
+    for _ in range(max(1, days // 5)):
+        gap_start = rng.integers(0, n_times - 200)
+        ghi[gap_start:gap_start + rng.integers(1, 180)] = np.nan
+
+    return pd.DataFrame(
+        index=times,
+        data={'longitude': longitude, 'sza': np.degrees(np.arccos(cosz.clip(-1, 1))),
+              'eth': e0 * mu0, 'ghi': ghi, 'ghics': ghics, 'ghicda': ghicda}
+    )
+
+
+def timeit(func, *args, repeat=3, **kwargs):
+    """
+    Best wall time (in seconds) of `repeat` calls to func(*args, **kwargs)
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
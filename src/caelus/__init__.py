@@ -4,7 +4,16 @@ import sys
 from loguru import logger
 
 from . import data, diagnostics
-from .classifier import classify
+from .classifier import Classifier, classify, classify_array
+from .batch import classify_many
+from .config import ClassifierConfig
+from .cube import classify_cube
+from .filters import CleaningPipeline
+from .incremental import reclassify
+from .panel import classify_panel
+from .sampling import regularize, sampling_interval
+from .sweep import VariabilityIndices, config_grid
+from .streaming import ProvisionalClassifier, StreamingClassifier, iter_classify
 
 __version__ = "0.2.0"
 
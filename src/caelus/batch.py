@@ -0,0 +1,179 @@
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from . import chunking, classifier, kernels
+from .config import resolve_config
+
+
+logger.disable(__name__)
+
+
+# variables of each series in the shared memory block, after the time stamps
+VARIABLES = ('sza', 'eth', 'ghi', 'ghics', 'ghicda', 'longitude')
+
+# persistent pool of worker processes of classify_many, and its number of workers
+_pool = None
+_pool_size = 0
+
+
+def classify_many(datasets, enable_ghi_mirroring=True, cleaning_pipeline=None,
+                  config=None, n_jobs=-1):
+    """
+    Classifies many time series (e.g., site-years) in a pool of worker processes,
+    as `classify` on each of them.
+
+    The input arrays and the output labels of all the series are placed in a
+    block of shared memory (multiprocessing.shared_memory), so that the workers
+    only receive the position of each series in the block, instead of a pickled
+    copy of its DataFrame, and write the labels in place. The pool is kept alive
+    and reused by the next calls with the same `n_jobs`, whatever the number of
+    series of each call.
+
+    Parameters:
+    -----------
+
+    datasets: list or dict of Pandas DataFrames
+      the time series, as in `classify`
+
+    enable_ghi_mirroring, cleaning_pipeline, config:
+      as in `classify`
+
+    n_jobs: int
+      number of worker processes, as in `classify` (by default, all the CPUs)
+
+    Returns:
+    --------
+
+    A list (or dict, with the keys of `datasets`) of Pandas Series with the sky
+    type labels of each series.
+    """
+    config = resolve_config(config)
+    keys = list(datasets) if isinstance(datasets, dict) else None
+    frames = [datasets[key] for key in keys] if keys is not None else list(datasets)
+
+    for data in frames:
+        classifier._check_variables(data.columns, enable_ghi_mirroring)
+
+    bounds = np.cumsum([0] + [len(data) for data in frames])
+    n_workers = chunking.resolve_n_jobs(n_jobs)
+    if n_workers <= 1 or len(frames) <= 1 or not bounds[-1]:
+        labels = [
+            classifier.classify(data, enable_ghi_mirroring, False, cleaning_pipeline,
+                                config=config)
+            for data in frames
+        ]
+        return dict(zip(keys, labels)) if keys is not None else labels
+
+    # block layout: time stamps, variables and labels, each one of 8-byte values
+    # for all the series one after the other
+    n_total = int(bounds[-1])
+    block = shared_memory.SharedMemory(
+        create=True, size=8 * n_total * (len(VARIABLES) + 2))
+    try:
+        _fill(block, n_total, frames, bounds)
+        # the units of the time stamps as given (see kernels.time_unit), which the
+        # block does not keep
+        units = [kernels.time_unit(data.index.values) for data in frames]
+        # the longest series first, to balance the load of the workers
+        tasks = [
+            (block.name, n_total, int(start), int(end), enable_ghi_mirroring,
+             cleaning_pipeline, config, unit)
+            for start, end, unit in sorted(zip(bounds[:-1], bounds[1:], units),
+                                           key=lambda bound: bound[0] - bound[1])
+        ]
+        logger.info(f'classifying {len(tasks)} series with '
+                    f'{min(n_workers, len(tasks))} processes')
+        try:
+            list(_get_pool(n_workers).map(_classify_task, tasks))
+        except BrokenProcessPool:
+            # a worker died (e.g., killed by the OS): the next call starts a new pool
+            shutdown_pool()
+            raise
+        labels = _labels(block, n_total, frames, bounds)
+    finally:
+        block.close()
+        block.unlink()
+
+    return dict(zip(keys, labels)) if keys is not None else labels
+
+
+def shutdown_pool():
+    """
+    Shuts down the pool of worker processes of classify_many, if any. It is done
+    automatically at exit
+    """
+    global _pool, _pool_size  # pylint: disable=global-statement
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+    _pool, _pool_size = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _get_pool(n_workers):
+    # the persistent pool, (re)created with `n_workers` processes if needed
+    global _pool, _pool_size  # pylint: disable=global-statement
+    if _pool is None or _pool_size != n_workers:
+        shutdown_pool()
+        logger.debug(f'starting a pool of {n_workers} worker processes')
+        _pool, _pool_size = ProcessPoolExecutor(max_workers=n_workers), n_workers
+    return _pool
+
+
+def _views(block, n_total):
+    # NumPy views of the time stamps, variables and labels in the block
+    times = np.ndarray((n_total,), dtype=np.int64, buffer=block.buf)
+    variables = np.ndarray((len(VARIABLES), n_total), dtype=np.float64,
+                           buffer=block.buf, offset=8 * n_total)
+    sky_type = np.ndarray((n_total,), dtype=np.int64, buffer=block.buf,
+                          offset=8 * n_total * (len(VARIABLES) + 1))
+    return times, variables, sky_type
+
+
+def _fill(block, n_total, frames, bounds):
+    # copies the time stamps and variables of the series into the block
+    times, variables, _ = _views(block, n_total)
+    for data, start, end in zip(frames, bounds[:-1], bounds[1:]):
+        times[start:end] = kernels.as_epoch_ns(data.index.values)
+        for row, name in enumerate(VARIABLES):
+            variables[row, start:end] = data[name].to_numpy(dtype=np.float64) \
+                if name in data.columns else np.nan
+
+
+def _labels(block, n_total, frames, bounds):
+    # the labels of each series, copied out of the block
+    _, _, sky_type = _views(block, n_total)
+    return [
+        pd.Series(index=data.index, data=sky_type[start:end].copy(), name='sky_type')
+        for data, start, end in zip(frames, bounds[:-1], bounds[1:])
+    ]
+
+
+def _classify_task(args):
+    # worker of classify_many: classifies the series in [start, end) of the block
+    # (attached only during the task, so that its memory is freed when unlinked)
+    name, n_total, start, end, *options = args
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        _classify_series(block, n_total, start, end, *options)
+    finally:
+        block.close()
+
+
+def _classify_series(block, n_total, start, end, enable_ghi_mirroring,
+                     cleaning_pipeline, config, unit):
+    # classifies the series in [start, end) of the block, and writes its labels
+    times, variables, sky_type = _views(block, n_total)
+    sza, eth, ghi, ghics, ghicda, longitude = variables[:, start:end]
+    sky_type[start:end] = classifier._classify_array(
+        times[start:end], sza, eth, ghi, ghics, ghicda, longitude,
+        enable_ghi_mirroring, False, cleaning_pipeline, config, unit=unit
+    )
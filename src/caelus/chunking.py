@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import classifier, kernels
+from .config import resolve_config
+
+
+# max. length of a true solar day, in ns, with some margin for the
+# variations of the equation of time
+MAX_DAY_LENGTH = pd.Timedelta(26, 'h').value
+
+
+def resolve_n_jobs(n_jobs):
+    """
+    Number of worker processes for `n_jobs`: None means 1 (serial), and
+    negative values count backwards from the number of CPUs (-1 is all of them)
+    """
+    if n_jobs is None:
+        return 1
+    n_jobs = int(n_jobs)
+    if n_jobs == 0:
+        raise ValueError('n_jobs must be a non-zero integer or None')
+    if n_jobs < 0:
+        n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def window_reach(step, config=None):
+    """
+    Number of grid positions (with time step `step`, in ns) before and after each
+    time step that are in its longest rolling window, with the ClassifierConfig
+    `config` (by default, the current options)
+    """
+    config = resolve_config(config)
+    window = max(config.window, config.window_f)
+    first, last = kernels.window_offsets(step, window)
+    return max(0, -first), max(0, last)
+
+
+def plan_chunks(times, sza, longitude, n_chunks, grid, enable_ghi_mirroring=True,
+                config=None):
+    """
+    Splits the time series into (at most) `n_chunks` chunks of contiguous time
+    steps that can be classified independently of each other.
+
+    The chunks start at night time steps (sza > max_sza), which are always of
+    unknown sky type and, hence, isolate the cleaning filters at both sides. Each
+    chunk is extended with a halo (see halo_start and halo_end) and, with ghi
+    mirroring, up to whole true solar days, since the mirroring uses all the data
+    of each day.
+
+    times: int64 array
+      the time stamps, in ns, on the regular grid `grid`, (origin, step) in ns
+
+    sza: float array
+      the solar zenith angle, in degrees
+
+    longitude: float or float array
+      the site's longitude, in degrees (only used with ghi mirroring)
+
+    config: ClassifierConfig
+      the classification settings (by default, the current options)
+
+    Returns a list of (start, end, lo, hi) tuples, where [start, end) are the time
+    steps classified by each chunk and [lo, hi) are the time steps it takes.
+    """
+    config = resolve_config(config)
+    n_times = times.size
+    night = np.flatnonzero(~(sza <= config.max_sza))
+
+    # a chunk must be longer than its halo to be worth it
+    n_positions = (times[-1] - times[0]) // grid[1] + 1 if n_times else 0
+    n_chunks = int(max(1, min(n_chunks, n_positions // (4 * kernels.PREFIX_BLOCK_SIZE))))
+    targets = [n_times * k // n_chunks for k in range(1, n_chunks)]
+    splits = np.unique(night[np.minimum(np.searchsorted(night, targets), night.size - 1)]) \
+        if night.size else np.zeros(0, dtype=np.int64)
+    bounds = np.r_[0, splits[(splits > 0) & (splits < n_times)], n_times]
+
+    chunks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        lo = halo_start(times, grid, start, longitude, enable_ghi_mirroring, config)
+        hi = halo_end(times, grid, end, longitude, enable_ghi_mirroring, config)
+        chunks.append((int(start), int(end), int(lo), int(hi)))
+    return chunks
+
+
+def halo_start(times, grid, start, longitude, enable_ghi_mirroring=True, config=None):
+    """
+    First time step of the halo of a chunk that starts at time step `start`.
+
+    The results of the chunk must be bit-identical to those of the whole series
+    with the same blocked prefix sums (see kernels.multi_window_indices), whose
+    time stamps lie on the regular grid `grid`. The amplitude ratio of the
+    cleaning filters takes Kv up to a window before the start of the chunk, Kv is
+    computed with prefix sums that restart at every block of the grid (see
+    kernels.regular_window_sums), and the differences in Kv take the rolling mean
+    of ghi in the previous block. Thus, the halo goes back up to one block before
+    the block of the first rolling window of the chunk.
+    """
+    origin, step = grid
+    size = kernels.PREFIX_BLOCK_SIZE
+    before, after = window_reach(step, config)
+    position = (times[start] - origin) // step
+    first = ((position - after) // size - 1) * size - before - 1
+    lo = np.searchsorted(times, origin + first * step, side='left')
+    if 0 < lo < times.size and times[lo] - times[lo - 1] > step and \
+            times[lo] >= origin + (position - after - 2 * before - 1) * step:
+        # after a data gap that reaches the rolling windows of the chunk, the
+        # differences in Kv take the previous time stamp, and hence the rolling
+        # mean of ghi in its block
+        position = (times[lo - 1] - origin) // step
+        first = ((position - after) // size - 1) * size - before - 1
+        lo = np.searchsorted(times, origin + first * step, side='left')
+    if enable_ghi_mirroring is True:
+        # from the first time step of the true solar day of `lo`
+        lo = day_start(times, longitude, lo)
+    return int(lo)
+
+
+def halo_end(times, grid, end, longitude, enable_ghi_mirroring=True, config=None):
+    """
+    Time step after the last one of the halo of a chunk that ends at time step
+    `end` (excluded). The halo covers the rolling windows of the rolling windows
+    (the amplitude ratio of Kv, whose differences take the rolling mean of ghi),
+    and `times` must have all the time stamps up to halo_reach after the chunk
+    """
+    origin, step = grid
+    hi = np.searchsorted(times, times[end - 1] + forward_reach(step, config), side='right')
+    if enable_ghi_mirroring is True:
+        # up to the last time step of the true solar day of `hi - 1`
+        hi = day_end(times, longitude, hi - 1)
+    return int(hi)
+
+
+def forward_reach(step, config=None):
+    """
+    Time span (ns) of the halo after the end of a chunk, before its extension
+    to whole true solar days (see halo_end)
+    """
+    _, after = window_reach(step, config)
+    return (3 * after + 2) * step
+
+
+def halo_reach(step, enable_ghi_mirroring=True, config=None):
+    """
+    Time span (ns) after the end of a chunk that halo_end may take
+    """
+    reach = forward_reach(step, config)
+    if enable_ghi_mirroring is True:
+        reach += MAX_DAY_LENGTH
+    return reach
+
+
+def overlap_reach(step, config=None):
+    """
+    Time span (ns) of the halo at each side of a chunk that may start and end at
+    any time step, not only at night (e.g., the chunks of a dask collection): two
+    true solar days, for the ghi mirroring and the cleaning filters of the days at
+    the edges of the chunk, plus the reach of the rolling windows and two blocks of
+    prefix sums (see halo_start), rounded up to whole blocks
+    """
+    size = kernels.PREFIX_BLOCK_SIZE
+    reach = (2 * MAX_DAY_LENGTH + forward_reach(step, config)) // step + 2 * size
+    return -(-reach // size) * size * step
+
+
+def day_start(times, longitude, index):
+    """
+    First time step of the true solar day of the time step `index`
+    """
+    first = np.searchsorted(times, times[index] - MAX_DAY_LENGTH, side='left')
+    days = true_solar_day(times, longitude, np.arange(first, index + 1))
+    return int(first + np.flatnonzero(days >= days[-1])[0])
+
+
+def day_end(times, longitude, index):
+    """
+    Time step after the last one of the true solar day of the time step `index`
+    """
+    last = np.searchsorted(times, times[index] + MAX_DAY_LENGTH, side='right')
+    days = true_solar_day(times, longitude, np.arange(index, last))
+    return int(index + np.flatnonzero(days <= days[0])[-1] + 1)
+
+
+def true_solar_day(times, longitude, index):
+    """
+    True solar day (days since epoch) of the time steps `index` of `times`
+    """
+    lon = longitude if np.ndim(longitude) == 0 else longitude[index]
+    return classifier.true_solar_time(times[index], lon) // 86400
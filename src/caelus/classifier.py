@@ -1,24 +1,30 @@
 
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
 
 from loguru import logger
 
-from . import options
+from . import chunking, columnar, kernels, partitioned, sampling
+from .config import resolve_config
 from .skytype import SkyType
-from .filters import (
-    clean_spurious_sky_patches,
-    clean_scatter_clouds_flanked_by_thin_clouds,
-    clean_cloudless_to_thin_clouds_transitions,
-    clean_thin_clouds_to_scatter_clouds_transitions
-)
+from .filters import CleaningPipeline
 
 
 logger.disable(__name__)
 
+# variables required by `classify`, besides the longitude for the ghi mirroring
+REQUIRED = ['sza', 'eth', 'ghi', 'ghics', 'ghicda']
+
+# dtypes of the outputs of `classify` with `compact=True`
+COMPACT_DTYPES = {
+    'sky_type': np.uint8, 'Km': np.float32, 'Kv': np.float32, 'Kvf': np.float32}
+
 
-def classify(data, enable_ghi_mirroring=True, full_output=False):
+def classify(data, enable_ghi_mirroring=True, full_output=False,
+             cleaning_pipeline=None, n_jobs=None, config=None, compact=False,
+             regularize=False):
     """
     Classifies a 1-min GHI time series into the following six sky types: overcast,
     thick clouds, scattered clouds, thin clouds, cloudless or cloud enhancement. If
@@ -26,6 +32,14 @@ def classify(data, enable_ghi_mirroring=True, full_output=False):
     `unknown` is used. See the SkyType class to see the integer labels of each sky
     type. It only works for sza > 85.
 
+    The rolling means and sums of the variability indices are those of pandas'
+    `rolling(dt, center=True)` on the whole series, to the last bit (see
+    kernels.rolling). The classifications in chunks (n_jobs, dask DataFrames,
+    iter_classify, the streaming classifiers, reclassify and classify_cube) take
+    blocked prefix sums instead, whose indices differ by round-off (about 1e-14,
+    relative), and so do the sky types of the few time steps whose indices are at
+    a threshold to within round-off (tens per year of 1-min data).
+
     Parameters:
     -----------
 
@@ -34,7 +48,11 @@ def classify(data, enable_ghi_mirroring=True, full_output=False):
       (sza, in degrees), extraterrestrial horizontal solar irradiance (eth, in W/m2),
       global horizontal irradiance (ghi, in W/m2), clear sky global horizontal solar
       irradiance (ghics, in W/m2), and clean-and-dry atmosphere global horizontal
-      solar irradiance (ghicda, in W/m2)
+      solar irradiance (ghicda, in W/m2). It can also be a dask DataFrame, which is
+      classified lazily, partition by partition (see
+      partitioned.classify_partitions), or an Arrow Table or RecordBatch, or a
+      Polars DataFrame, with the time stamps in a column `time`, which are read
+      without copies (see columnar.classify_table)
 
     enable_ghi_mirroring: bool
       extrapolation of ghi data beyond sunrise and sunset to mitigate border effects
@@ -45,10 +63,46 @@ def classify(data, enable_ghi_mirroring=True, full_output=False):
       classification results. When set to True, it has additional columns with internal
       variability indices used during the classification process.
 
+    cleaning_pipeline: CleaningPipeline
+      the cleaning filters applied after the thresholding. By default, the filters
+      enabled in `config` (see CleaningPipeline.from_config)
+
+    n_jobs: int
+      number of worker processes. With more than one, the series is split in
+      chunks at night time, which are classified in parallel with enough overlap
+      to give the same result whatever the number of processes. It is that of a
+      single process but for the ties at the thresholds (see above). Negative
+      values count backwards from the number of CPUs (-1 uses all of them). By
+      default, the classification runs in the calling process. It is not used
+      with a dask DataFrame, whose partitions are classified by the dask scheduler
+
+    config: ClassifierConfig
+      the classification settings (windows, thresholds and cleaning filters). By
+      default, the current values of caelus.options (see ClassifierConfig)
+
+    compact: bool
+      when set to True, the sky types are uint8 instead of int64 and the
+      variability indices of `full_output` are float32 instead of float64, to save
+      the memory of the outputs (e.g., for long archives held in memory). It only
+      narrows the outputs: the classification itself runs in float64, with the
+      same intermediate arrays and hence the same peak memory while it runs, so
+      that the sky types are the same, and the float32 indices are those of
+      float64 rounded to nearest (relative error up to 2**-24, about 6e-8)
+
+    regularize: bool
+      when set to True, `data` is first averaged on the regular 1-min grid (see
+      sampling.regularize), so that data at higher rates (e.g., 1-s or 10-s
+      data) can be classified directly, and data gaps and duplicate time stamps
+      do not change the rolling windows. The output is on that grid (or, for data
+      already on a regular 1-min grid, e.g., at the 30th second, on theirs), with
+      the time steps without enough valid data of unknown sky type. Only for
+      Pandas DataFrames
+
     Returns:
     --------
 
-    A Pandas DataFrame.
+    A Pandas DataFrame (or a dask one, for a dask DataFrame `data`, or an Arrow
+    uint8 array, for Arrow and Polars `data`).
 
     The column `sky_type` contains the integer label for each sky type class. The label
     is directly traceable to the members of the SkyType class. Additionally, it may contain
@@ -56,196 +110,558 @@ def classify(data, enable_ghi_mirroring=True, full_output=False):
 
     """
 
-    required = ['sza', 'eth', 'ghi', 'ghics', 'ghicda']
-    if missing := list(set(required).difference(data.columns)):
-        raise ValueError(f'missing required variables: {", ".join(missing)}')
+    if regularize is True:
+        if columnar.is_columnar(data) or partitioned.is_dask_dataframe(data):
+            raise ValueError('regularize is only supported for Pandas DataFrames')
+        data = sampling.regularize(data)
+
+    if columnar.is_columnar(data):
+        return columnar.classify_table(
+            data, enable_ghi_mirroring, full_output, cleaning_pipeline, n_jobs, config,
+            compact)
+
+    _check_variables(data.columns, enable_ghi_mirroring)
+
+    if partitioned.is_dask_dataframe(data):
+        return partitioned.classify_partitions(
+            data, enable_ghi_mirroring, full_output, cleaning_pipeline, config, compact)
+
+    longitude = data['longitude'].to_numpy() if 'longitude' in data.columns else None
+
+    result = classify_array(
+        data.index.values,
+        *[data[name].to_numpy() for name in REQUIRED],
+        longitude=longitude,
+        enable_ghi_mirroring=enable_ghi_mirroring,
+        full_output=full_output,
+        cleaning_pipeline=cleaning_pipeline,
+        n_jobs=n_jobs,
+        config=config,
+        compact=compact
+    )
 
-    if enable_ghi_mirroring is True:
-        if 'longitude' not in data.columns:
-            raise ValueError('missing required variable: longitude')
+    if full_output is True:
+        return pd.DataFrame(index=data.index, data=result)
+    return pd.Series(index=data.index, data=result, name='sky_type')
 
-    daytime = data['sza'] <= options.MAX_SZA
 
-    Kcs = (data['ghi'].divide(data['ghics'])
-           .where(data['sza'] < 87., np.nan).clip(0.))
+def classify_array(times, sza, eth, ghi, ghics, ghicda, longitude=None,
+                   enable_ghi_mirroring=True, full_output=False,
+                   cleaning_pipeline=None, n_jobs=None, config=None, compact=False):
+    """
+    Array version of `classify`. It does the same classification, but on NumPy
+    arrays instead of a Pandas DataFrame.
 
-    ghi = data.ghi
-    if enable_ghi_mirroring is True:
-        ghi = ghi_mirroring(data)
+    Parameters:
+    -----------
 
-    mean_ghi = ghi.rolling(options.DT, center=True).mean()
-    Km = mean_ghi.divide(data['ghicda']).where(daytime, np.nan).clip(0.)
+    times: array of datetime64 (or int64 nanoseconds since epoch)
+      the UTC time stamps, sorted in increasing order
 
-    Kv = (
-        (ghi - mean_ghi).diff().abs().rolling(options.DT, center=True)
-        .sum()/pd.Timedelta(options.DT).total_seconds()
-    )
+    sza, eth, ghi, ghics, ghicda: float arrays
+      the input variables, as in `classify`
 
-    Kvf = (
-        (ghi - mean_ghi).diff().abs().rolling(options.DT_F, center=True)
-        .sum()/pd.Timedelta(options.DT_F).total_seconds()
-    )
+    longitude: float or float array
+      the site's longitude, in degrees. Only required for the ghi mirroring
 
-    # Thresholding...
+    enable_ghi_mirroring, full_output, cleaning_pipeline, n_jobs, config, compact:
+      as in `classify`
 
-    sza = data['sza']
-    clouden = (
-        (
-            daytime &
-            (sza < 80.) &
-            (Kcs > options.CLOUDEN_MIN_KCS) &
-            (Kv > options.CLOUDEN_MIN_KV) & (Kvf > options.CLOUDEN_MIN_KVF)
-        )
+    Returns:
+    --------
+
+    An int64 (uint8, if `compact` is True) array with the sky type labels or, if
+    `full_output` is True, a dict of arrays with the keys `sky_type`, `Km`, `Kv`
+    and `Kvf`.
+    """
+
+    config = resolve_config(config)
+    times, sza, eth, ghi, ghics, ghicda, longitude, unit = _prepare(
+        times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring)
+
+    if (n_jobs := chunking.resolve_n_jobs(n_jobs)) > 1:
+        step = kernels.grid_step(times)
+        if step is None:
+            logger.warning('the time stamps are not on a regular grid: '
+                           'the classification runs in a single process')
+        else:
+            grid = (times[0], step)
+            chunks = chunking.plan_chunks(
+                times, sza, longitude, n_jobs, grid, enable_ghi_mirroring, config)
+            if len(chunks) > 1:
+                return _classify_in_chunks(
+                    chunks, grid, times, sza, eth, ghi, ghics, ghicda,
+                    longitude, enable_ghi_mirroring, full_output, cleaning_pipeline,
+                    config, n_jobs, compact, unit
+                )
+
+    result = _classify_array(
+        times, sza, eth, ghi, ghics, ghicda, longitude,
+        enable_ghi_mirroring, full_output, cleaning_pipeline, config, unit=unit
     )
+    return _compact(result) if compact is True else result
 
-    cloudless = (
-        (
-            daytime &
-            (sza < 75.) &
-            (Km > options.CLOUDLESS_MIN_KM) &
-            (Kcs > options.CLOUDLESS_MIN_KCS) & (Kcs < options.CLOUDLESS_MAX_KCS) &
-            (Kv < options.CLOUDLESS_MAX_KV)
-        ) |
-        (
-            daytime &
-            (sza >= 75.) &
-            (Km > options.CLOUDLESS_MIN_KM) &
-            (Kcs > 0.80) & (Kcs < 1.20) &
-            (Kv < options.CLOUDLESS_MAX_KV)
+
+class Classifier:
+    """
+    Classifier for many repeated classifications with the same settings (e.g., a
+    service that classifies the last days of data of a site every few minutes, or
+    of many sites one after the other). The sky types are those of
+    `classify_array`. The config and the cleaning pipeline are resolved once, at
+    the creation of the classifier, and the results can be written into arrays of
+    the caller (see Classifier.classify_array). The intermediate arrays of each
+    classification are allocated as in `classify_array`.
+
+    enable_ghi_mirroring, full_output, cleaning_pipeline, config, compact:
+      as in `classify`. The config (by default, the current options) is taken at
+      the creation of the classifier
+
+    Usage:
+
+        classifier = Classifier()
+        sky_type = np.empty(3 * 1440, dtype=np.uint8)
+        for arrays in feed:  # the arrays of classify_array, up to 3 days long
+            classifier.classify_array(*arrays, out=sky_type[:arrays[0].size])
+            ...
+    """
+
+    def __init__(self, enable_ghi_mirroring=True, full_output=False,
+                 cleaning_pipeline=None, config=None, compact=False):
+        self.enable_ghi_mirroring = enable_ghi_mirroring
+        self.full_output = full_output
+        self.config = resolve_config(config)
+        self.cleaning_pipeline = (
+            CleaningPipeline.from_config(self.config) if cleaning_pipeline is None
+            else cleaning_pipeline
+        )
+        self.compact = compact
+
+    def classify(self, data):
+        """
+        Classifies the Pandas DataFrame `data`, with the variables required by
+        `classify`, and returns a Pandas Series (or DataFrame, with full_output)
+        """
+        _check_variables(data.columns, self.enable_ghi_mirroring)
+
+        longitude = data['longitude'].to_numpy() if 'longitude' in data.columns else None
+        result = self.classify_array(
+            data.index.values, *[data[name].to_numpy() for name in REQUIRED], longitude)
+
+        if self.full_output is True:
+            return pd.DataFrame(index=data.index, data=result)
+        return pd.Series(index=data.index, data=result, name='sky_type')
+
+    def classify_array(self, times, sza, eth, ghi, ghics, ghicda, longitude=None,
+                       out=None):
+        """
+        Array version of `Classifier.classify`, with the arguments of
+        `classify_array`. The sky types (or, with full_output, the arrays with
+        the keys `sky_type`, `Km`, `Kv` and `Kvf`) are written in `out` (an array,
+        or a dict of arrays, of any dtype that holds them), which is returned. By
+        default, they are new arrays
+        """
+        times, sza, eth, ghi, ghics, ghicda, longitude, unit = _prepare(
+            times, sza, eth, ghi, ghics, ghicda, longitude, self.enable_ghi_mirroring)
+
+        result = _classify_array(
+            times, sza, eth, ghi, ghics, ghicda, longitude, self.enable_ghi_mirroring,
+            self.full_output, self.cleaning_pipeline, self.config, unit=unit
         )
-    )
 
-    overcast = (
-        daytime &
-        (Km < options.OVERCAST_MAX_KM) &
-        (Kv < options.OVERCAST_MAX_KV)
-    )
+        if out is not None:
+            if self.full_output is True:
+                for name, values in result.items():
+                    np.copyto(out[name], values, casting='unsafe')
+            else:
+                np.copyto(out, result, casting='unsafe')
+            return out
+        return _compact(result) if self.compact is True else result
+
+
+def _classify_array(times, sza, eth, ghi, ghics, ghicda, longitude,
+                    enable_ghi_mirroring, full_output, cleaning_pipeline, config,
+                    grid=None, unit=1):
+    # classification engine, on contiguous float64 arrays and int64 time stamps,
+    # with the ClassifierConfig `config`. `grid` is the regular grid of the whole
+    # series when classifying a chunk of it (see kernels.multi_window_indices), and
+    # `unit` that of the time stamps as given (see _ghi_mirroring)
+
+    Km, Kv, Kvf = _indices(
+        times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, config, grid, unit)
+
+    # the sky type of the night time steps is always unknown: the thresholds are
+    # only applied at daytime
+    daytime = np.flatnonzero(sza <= config.max_sza)
+    sky_type = np.full(sza.shape, SkyType.UNKNOWN, dtype=np.int64)
+    sky_type[daytime] = _threshold(
+        *[x[daytime] for x in (sza, ghi, ghics, Km, Kv, Kvf)], config)
+    sky_type = _clean(
+        sky_type, times, sza, ghi, Km, Kv, Kvf, cleaning_pipeline, config)
 
-    cloudy = daytime & ~cloudless & ~overcast & ~clouden
+    if full_output is True:
+        return {'sky_type': sky_type, 'Km': Km, 'Kv': Kv, 'Kvf': Kvf}
+    return sky_type
 
-    thinclouds = (
-        cloudy &
-        (Km > options.THINCLOUDS_MIN_KM) &
-        (Kv >= options.THINCLOUDS_MIN_KV) & (Kv < options.THINCLOUDS_MAX_KV)
-    )
 
-    thickclouds = (
-        cloudy &
-        (Km < options.THICKCLOUDS_MAX_KM) &
-        (Kv >= options.THICKCLOUDS_MIN_KV) & (Kv < options.THICKCLOUDS_MAX_KV)
-    )
+def _check_variables(names, enable_ghi_mirroring=True, longitude='longitude'):
+    # raises a ValueError if the variables required by `classify` (and the
+    # variable `longitude`, for the ghi mirroring) are not among `names`
+    if missing := [name for name in REQUIRED if name not in names]:
+        raise ValueError(f'missing required variables: {", ".join(missing)}')
+    if enable_ghi_mirroring is True and longitude not in names:
+        raise ValueError(f'missing required variable: {longitude}')
 
-    scatterclouds = cloudy & ~thickclouds & ~thinclouds
 
-    sky_type = pd.Series(
-        index=data.index,
-        data=SkyType.UNKNOWN,
-        name='sky_type'
+def _prepare(times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring):
+    # the arguments of classify_array as float64 arrays, with the time stamps in
+    # nanoseconds since epoch, followed by the unit of the time stamps given
+    # (see kernels.time_unit)
+    if enable_ghi_mirroring is True:
+        if longitude is None:
+            raise ValueError('missing required variable: longitude')
+        longitude = np.asarray(longitude, dtype=np.float64)
+    unit = kernels.time_unit(times)
+    times = kernels.as_epoch_ns(times)
+    sza, eth, ghi, ghics, ghicda = [
+        np.ascontiguousarray(x, dtype=np.float64) for x in (sza, eth, ghi, ghics, ghicda)
+    ]
+    return times, sza, eth, ghi, ghics, ghicda, longitude, unit
+
+
+def _compact(result):
+    # the labels (or the dict of full_output) of _classify_array, with the
+    # COMPACT_DTYPES
+    if isinstance(result, dict):
+        return {name: values.astype(COMPACT_DTYPES[name]) for name, values in result.items()}
+    return result.astype(COMPACT_DTYPES['sky_type'])
+
+
+def _indices(times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, config,
+             grid=None, unit=1):
+    # variability indices Km, Kv and Kvf, which only depend on the windows and
+    # max_sza of the config
+    indices = _window_indices(
+        times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, config.max_sza,
+        [config.window], [config.window_f], grid, unit
     )
+    return indices[config.window, config.window_f]
+
+
+def _window_indices(times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, max_sza,
+                    windows, windows_f, grid=None, unit=1):
+    # Km, Kv and Kvf of each (window, window_f), with a single ghi mirroring (see
+    # kernels.multi_window_indices)
+
+    daytime = sza <= max_sza
 
-    sky_type.loc[overcast] = SkyType.OVERCAST
-    sky_type.loc[thickclouds] = SkyType.THICK_CLOUDS
-    sky_type.loc[scatterclouds] = SkyType.SCATTER_CLOUDS
-    sky_type.loc[thinclouds] = SkyType.THIN_CLOUDS
-    sky_type.loc[cloudless] = SkyType.CLOUDLESS
-    sky_type.loc[clouden] = SkyType.CLOUD_ENHANCEMENT
+    with np.errstate(invalid='ignore', divide='ignore'):
 
-    # clean the sky classification...
+        ghi_ = ghi
+        if enable_ghi_mirroring is True:
+            ghi_ = _ghi_mirroring(times, sza, ghi, longitude, unit=unit)
 
-    if options.CLEAN_SPURIOUS_SKY_PATCHES is True:
-        sky_type.loc[:] = clean_spurious_sky_patches(
-            sky_type, min_sky_patch_len=15, max_iter=50
+        indices = kernels.multi_window_indices(times, ghi_, windows, windows_f, grid=grid)
+        return {
+            windows: (np.where(daytime, mean_ghi / ghicda, np.nan).clip(0.), Kv, Kvf)
+            for windows, (mean_ghi, Kv, Kvf) in indices.items()
+        }
+
+
+def _clean(sky_type, times, sza, ghi, Km, Kv, Kvf, cleaning_pipeline, config):
+    # cleaning filters on the thresholded sky type (see _threshold)
+
+    if cleaning_pipeline is None:
+        cleaning_pipeline = CleaningPipeline.from_config(config)
+
+    sky_type = cleaning_pipeline.run(
+        sky_type, times=times, sza=sza, ghi=ghi, Km=Km, Kv=Kv, Kvf=Kvf, config=config
+    ).astype(np.int64, copy=False)
+
+    sky_type[~(sza <= config.max_sza)] = SkyType.UNKNOWN
+    sky_type[np.isnan(ghi)] = SkyType.UNKNOWN
+    return sky_type
+
+
+def _threshold(sza, ghi, ghics, Km, Kv, Kvf, config):
+    # sky type of each time step from the thresholds of its variability
+    # indices, before the cleaning filters. The thresholds in `config` can also
+    # be column arrays, one row per set of thresholds (see sweep.VariabilityIndices)
+
+    daytime = sza <= config.max_sza
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+
+        Kcs = np.where(sza < 87., ghi / ghics, np.nan).clip(0.)
+
+        clouden = (
+            daytime &
+            (sza < 80.) &
+            (Kcs > config.clouden_min_kcs) &
+            (Kv > config.clouden_min_kv) & (Kvf > config.clouden_min_kvf)
         )
 
-    if options.CLEAN_SCATTER_CLOUDS_FLANKED_BY_THIN_CLOUDS is True:
-        sky_type.loc[:] = clean_scatter_clouds_flanked_by_thin_clouds(
-            sky_type, options.DT, sza, Km, Kv
+        cloudless = (
+            daytime &
+            (Km > config.cloudless_min_km) &
+            (Kv < config.cloudless_max_kv) &
+            np.where(
+                sza < 75.,
+                (Kcs > config.cloudless_min_kcs) & (Kcs < config.cloudless_max_kcs),
+                (Kcs > 0.80) & (Kcs < 1.20)
+            )
         )
 
-    if options.CLEAN_CLOUDLESS_TO_THIN_CLOUDS_TRANSITIONS is True:
-        sky_type.loc[:] = clean_cloudless_to_thin_clouds_transitions(
-            sky_type, Kv
+        overcast = (
+            daytime &
+            (Km < config.overcast_max_km) &
+            (Kv < config.overcast_max_kv)
         )
 
-    if options.CLEAN_THIN_CLOUDS_TO_SCATTER_CLOUDS_TRANSITIONS is True:
-        sky_type.loc[:] = clean_thin_clouds_to_scatter_clouds_transitions(
-            sky_type, Kv
+        cloudy = daytime & ~cloudless & ~overcast & ~clouden
+
+        thinclouds = (
+            cloudy &
+            (Km > config.thinclouds_min_km) &
+            (Kv >= config.thinclouds_min_kv) & (Kv < config.thinclouds_max_kv)
         )
 
-    sky_type.loc[~daytime] = SkyType.UNKNOWN
-    sky_type.loc[data['ghi'].isna()] = SkyType.UNKNOWN
+        thickclouds = (
+            cloudy &
+            (Km < config.thickclouds_max_km) &
+            (Kv >= config.thickclouds_min_kv) & (Kv < config.thickclouds_max_kv)
+        )
 
-    sky_type = sky_type.astype(int)
+        scatterclouds = cloudy & ~thickclouds & ~thinclouds
 
-    if full_output is True:
-        sky_type = sky_type.to_frame(name='sky_type')
-        sky_type['Km'] = Km
-        sky_type['Kv'] = Kv
-        sky_type['Kvf'] = Kvf
+    sky_type = np.full(cloudy.shape, SkyType.UNKNOWN, dtype=np.int64)
+    sky_type[overcast] = SkyType.OVERCAST
+    sky_type[thickclouds] = SkyType.THICK_CLOUDS
+    sky_type[scatterclouds] = SkyType.SCATTER_CLOUDS
+    sky_type[thinclouds] = SkyType.THIN_CLOUDS
+    sky_type[cloudless] = SkyType.CLOUDLESS
+    sky_type[clouden] = SkyType.CLOUD_ENHANCEMENT
     return sky_type
 
 
+def _classify_in_chunks(chunks, grid, times, sza, eth, ghi, ghics, ghicda, longitude,
+                        enable_ghi_mirroring, full_output, cleaning_pipeline, config,
+                        n_jobs, compact=False, unit=1):
+    # classifies each chunk (see chunking.plan_chunks) in a pool of worker processes,
+    # and stitches the results back together (compacted by the workers, if
+    # `compact`, so that the full-size int64 and float64 results are never built)
+
+    def chunk_args(start, end, lo, hi):
+        variables = [x[lo:hi] for x in (times, sza, eth, ghi, ghics, ghicda)]
+        lon = longitude if np.ndim(longitude) == 0 else longitude[lo:hi]
+        return (
+            variables, lon, enable_ghi_mirroring, full_output, cleaning_pipeline, config,
+            grid, (start - lo, end - lo), compact, unit
+        )
+
+    logger.info(f'classifying {len(chunks)} chunks with {n_jobs} processes')
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as executor:
+        results = list(executor.map(
+            _classify_chunk, [chunk_args(*chunk) for chunk in chunks]))
+
+    if full_output is True:
+        return {
+            name: np.concatenate([chunk[name] for chunk in results])
+            for name in results[0]
+        }
+    return np.concatenate(results)
+
+
+def _classify_chunk(args):
+    # worker of _classify_in_chunks
+    (variables, longitude, enable_ghi_mirroring, full_output, cleaning_pipeline,
+     config, grid, domain, compact, unit) = args
+    result = _classify_array(
+        *variables, longitude, enable_ghi_mirroring, full_output, cleaning_pipeline,
+        config, grid, unit)
+    if full_output is True:
+        result = {name: values[slice(*domain)] for name, values in result.items()}
+    else:
+        result = result[slice(*domain)]
+    return _compact(result) if compact is True else result
+
+
 def ghi_mirroring(data):
+    """
+    Extrapolates ghi beyond sunrise and sunset, mirroring the daytime ghi with
+    respect to the cosine of the solar zenith angle, separately for the morning
+    and the afternoon of each true solar day. Before that, data gaps are filled
+    by linear interpolation in time (see `_ghi_mirroring`).
 
-    def true_solar_time(times_utc, longitude):
-        # eq. of time
-        doy = (times_utc.day_of_year.astype(float) +
-            (times_utc.hour + (times_utc.minute + times_utc.second/60)/60)/24)
-        n_days = pd.Series(index=times_utc, data=366.).where(times_utc.is_leap_year, 365.)
-        angle = (2.*np.pi / n_days) * doy
-        # this is a fit to match the NREL's SPA equation of time
-        eot = (0.00986571
-            + 0.58688718*np.cos(  angle) - 7.34538133*np.sin(  angle)
-            - 3.31493999*np.cos(2*angle) - 9.35366541*np.sin(2*angle)    
-            - 0.08151750*np.cos(3*angle) - 0.30892409*np.sin(3*angle)
-            - 0.13532889*np.cos(4*angle) - 0.17336220*np.sin(4*angle))  # minutes
-
-        dt64_s = np.datetime64(1, 's')
-        utc_f = np.array(times_utc, dtype=dt64_s).astype('float64')
-        tst_f = utc_f + (4. * longitude + eot) * 60.
-        return pd.to_datetime(np.array(tst_f, dtype=dt64_s))
-
-    def interpolate(xi, yi, x):
-        kwargs = dict(kind='linear', bounds_error=False, fill_value=np.nan)
-        return interp1d(xi, yi, **kwargs)(x)
+    data: Pandas DataFrame
+      it must contain the solar zenith angle (sza, in degrees), the site's
+      longitude (longitude, in degrees) and ghi (in W/m2)
+
+    Returns a Pandas Series with the mirrored ghi.
+    """
 
     required = ['sza', 'longitude', 'ghi']
     if missing := list(set(required).difference(data.columns)):
         raise ValueError(f'missing required variables: {", ".join(missing)}')
 
-    ghi = data['ghi']
-    ghi_mirror = ghi.copy()
-    cosz = pd.Series(index=ghi.index, data=np.cos(np.radians(data['sza'])))
-    tst = pd.Series(
-        index=ghi.index, data=true_solar_time(ghi.index, data['longitude']))
-
-    for (_, this_ghi) in ghi.groupby(tst.dt.date):
-
-        this_cosz = cosz.loc[this_ghi.index]
-        daytime = this_cosz > 0
-        nighttime = this_cosz <= 0
-        am = tst.loc[this_ghi.index].dt.hour < 12
-        pm = tst.loc[this_ghi.index].dt.hour >= 12
-
-        # fill gaps shorter than DT to improve the rolling averages
-        this_ghi_filled = this_ghi.interpolate(
-            'time', limit=pd.Timedelta(4, 'h').seconds // 60)
-        this_ghi_filled.loc[nighttime] = np.nan
-
-        if len(this_cosz.loc[am & daytime]):
-            this_ghi_filled.loc[am & nighttime] = -interpolate(
-                this_cosz.loc[am & daytime],
-                this_ghi_filled.loc[am & daytime],
-                -this_cosz.loc[am & nighttime]
-            )
+    ghi_mirror = _ghi_mirroring(
+        kernels.as_epoch_ns(data.index.values),
+        data['sza'].to_numpy(dtype=np.float64),
+        data['ghi'].to_numpy(dtype=np.float64),
+        data['longitude'].to_numpy(dtype=np.float64),
+        unit=kernels.time_unit(data.index.values)
+    )
+    return pd.Series(index=data.index, data=ghi_mirror, name=data['ghi'].name)
+
+
+def true_solar_time(times, longitude):
+    """
+    True solar time, in whole seconds since epoch, for the UTC times `times`
+    (int64 nanoseconds since epoch) and the site's longitude (in degrees)
+    """
+    days, nanoseconds = np.divmod(times, 86400 * 10**9)
+    hour, seconds = np.divmod(nanoseconds // 10**9, 3600)
+    minute, second = np.divmod(seconds, 60)
+
+    year = times.view('datetime64[ns]').astype('datetime64[Y]')
+    day_of_year = days - year.astype('datetime64[D]').view(np.int64) + 1
+    year = year.view(np.int64) + 1970
+    is_leap_year = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+
+    # eq. of time
+    doy = day_of_year.astype(float) + (hour + (minute + second/60)/60)/24
+    n_days = np.where(is_leap_year, 366., 365.)
+    angle = (2.*np.pi / n_days) * doy
+    # this is a fit to match the NREL's SPA equation of time
+    eot = (0.00986571
+        + 0.58688718*np.cos(  angle) - 7.34538133*np.sin(  angle)
+        - 3.31493999*np.cos(2*angle) - 9.35366541*np.sin(2*angle)
+        - 0.08151750*np.cos(3*angle) - 0.30892409*np.sin(3*angle)
+        - 0.13532889*np.cos(4*angle) - 0.17336220*np.sin(4*angle))  # minutes
+
+    utc_f = (times // 10**9).astype('float64')
+    tst_f = utc_f + (4. * longitude + eot) * 60.
+    return tst_f.astype(np.int64)
+
+
+def _interp(x, x_lo, x_hi, y_lo, y_hi):
+    # linear interpolation between (x_lo, y_lo) and (x_hi, y_hi), with the same
+    # floating-point operations as np.interp
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        y = slope*(x - x_lo) + y_lo
+        y = np.where(np.isnan(y), slope*(x - x_hi) + y_hi, y)
+        y = np.where(np.isnan(y) & (y_lo == y_hi), y_lo, y)
+    return np.where(x == x_lo, y_lo, y)
+
+
+def _segmented_interp(key, x, y, query_key, query):
+    # linear interpolation of (x, y) at `query`, separately for each segment `key`,
+    # with NaN outside the range of x in the segment (as interp1d, with
+    # bounds_error=False and fill_value=np.nan)
+
+    # data and queries sorted by segment (stable sorts, so that the data with the
+    # same x keep their order when sorted by x below)
+    order = np.argsort(key, kind='stable')
+    key, x, y = key[order], x[order], y[order]
+    query_order = np.argsort(query_key, kind='stable')
+    query_key, query = query_key[query_order], query[query_order]
+
+    segments, query_start = np.unique(query_key, return_index=True)
+    query_end = np.r_[query_start[1:], query.size]
+    first = np.searchsorted(key, segments, side='left')
+    end = np.searchsorted(key, segments, side='right')
+
+    # index of the last data point in the segment that is not above each query
+    # (or first - 1 if there is none), with the data of each segment sorted by x.
+    # There are only two segments (half days) per day, so that a loop is cheaper
+    # than a joint sort of data and queries
+    lower = np.empty(query.size, dtype=np.int64)
+    for lo, hi, q_lo, q_hi in zip(first, end, query_start, query_end):
+        if hi - lo > 1:
+            by_x = np.argsort(x[lo:hi], kind='stable')
+            x[lo:hi], y[lo:hi] = x[lo:hi][by_x], y[lo:hi][by_x]
+        lower[q_lo:q_hi] = lo - 1 + np.searchsorted(x[lo:hi], query[q_lo:q_hi], side='right')
+
+    n_queries = query_end - query_start
+    first, last = np.repeat(first, n_queries), np.repeat(end - 1, n_queries)
+    inside = (last >= first) & (lower >= first)
+    inside[inside] = query[inside] <= x[last[inside]]
+
+    values = np.full(query.size, np.nan)
+    lower, last, query = lower[inside], last[inside], query[inside]
+    upper = np.minimum(lower + 1, last)
+    values[query_order[inside]] = np.where(
+        lower == last, y[last],
+        _interp(query, x[lower], x[upper], y[lower], y[upper])
+    )
+    return values
 
-        if len(this_cosz.loc[pm & daytime]):
-            this_ghi_filled.loc[pm & nighttime] = -interpolate(
-                this_cosz.loc[pm & daytime],
-                this_ghi_filled.loc[pm & daytime],
-                -this_cosz.loc[pm & nighttime]
-            )
 
-        ghi_mirror.loc[this_ghi.index] = this_ghi_filled
+def _ghi_mirroring(times, sza, ghi, longitude, series=None, tst=None, unit=1):
+    """
+    Array version of `ghi_mirroring`, vectorized for all days at once.
+
+    First, data gaps are filled by linear interpolation in time (up to 240 time
+    steps after the last valid value, and with that value at the end of the day),
+    as in pandas' `Series.interpolate('time', limit=240)` per day. As pandas, it
+    interpolates in the time stamps as numbers of the `unit` (in ns) of the index
+    (see kernels.time_unit), whose round-off depends on it. Then, the ghi
+    at night time is replaced by minus the ghi interpolated at -cos(sza) in the
+    daytime part of the same half (morning or afternoon) of the day.
+
+    The arrays may hold several time series one after the other (e.g., of several
+    sites), each one labelled by the non-negative integers in `series`, whose days
+    are mirrored separately. `tst` is their true solar time, if already known.
+    """
+    if tst is None:
+        tst = true_solar_time(times, longitude)
+    day, seconds = np.divmod(tst, 86400)
+    pm = seconds >= 43200
+    if series is not None and day.size:
+        day = series * (day.max() - day.min() + 1) + (day - day.min())
+
+    order = None
+    if np.any(day[1:] < day[:-1]):
+        order = np.argsort(day, kind='stable')
+        times, sza, ghi, day, pm = times[order], sza[order], ghi[order], day[order], pm[order]
+
+    n_times = ghi.size
+    position = np.arange(n_times)
+    day_start = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    day_end = np.r_[day_start[1:], n_times] - 1
+    day_length = np.diff(np.r_[day_start, n_times])
+    day_start = np.repeat(day_start, day_length)
+    day_end = np.repeat(day_end, day_length)
+
+    # fill gaps shorter than DT to improve the rolling averages
+    limit = pd.Timedelta(4, 'h').seconds // 60
+
+    valid = ~np.isnan(ghi)
+    prev = np.maximum.accumulate(np.where(valid, position, -1))
+    next_ = np.minimum.accumulate(np.where(valid, position, n_times)[::-1])[::-1]
+
+    ghi_filled = ghi.copy()
+    to_fill = ~valid & (prev >= day_start) & (position - prev <= limit)
+    trailing = to_fill & (next_ > day_end)
+    ghi_filled[trailing] = ghi[prev[trailing]]
+    inner = np.flatnonzero(to_fill & ~trailing)
+    x = (times // unit).astype('float64')
+    lo, hi = prev[inner], next_[inner]
+    ghi_filled[inner] = _interp(x[inner], x[lo], x[hi], ghi[lo], ghi[hi])
+
+    cosz = np.cos(np.radians(sza))
+    daytime = cosz > 0
+    nighttime = cosz <= 0
+    ghi_filled[nighttime] = np.nan
+
+    half_day = 2*day + pm
+    ghi_filled[nighttime] = -_segmented_interp(
+        half_day[daytime], cosz[daytime], ghi_filled[daytime],
+        half_day[nighttime], -cosz[nighttime]
+    )
 
-    return ghi_mirror
+    if order is not None:
+        ghi_mirror = np.empty_like(ghi_filled)
+        ghi_mirror[order] = ghi_filled
+        return ghi_mirror
+    return ghi_filled
@@ -0,0 +1,84 @@
+import numpy as np
+
+from loguru import logger
+
+from . import classifier
+
+
+logger.disable(__name__)
+
+
+def is_columnar(data):
+    """
+    Whether `data` is an Arrow Table or RecordBatch, or a Polars DataFrame (without
+    importing pyarrow or polars)
+    """
+    module = type(data).__module__.split('.')[0]
+    return (module == 'pyarrow' and hasattr(data, 'schema')) or \
+        (module == 'polars' and hasattr(data, 'to_arrow'))
+
+
+def classify_table(data, enable_ghi_mirroring=True, full_output=False,
+                   cleaning_pipeline=None, n_jobs=None, config=None, compact=False):
+    """
+    Version of `classify` for an Arrow Table or RecordBatch, or a Polars DataFrame,
+    with the UTC time stamps in the column `time` (or in the only timestamp
+    column) instead of an index.
+
+    The columns are read as NumPy views of the Arrow buffers, without copies, when
+    they are float64 (or timestamp) columns in a single chunk and without nulls.
+    Otherwise, they are copied, with NaN at the nulls. The Polars DataFrames are
+    read through their Arrow tables, which share their buffers.
+
+    Returns an Arrow uint8 array with the sky types or, if `full_output` is True,
+    an Arrow Table with the columns `sky_type`, `Km`, `Kv` and `Kvf` (float32,
+    if `compact` is True).
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    if type(data).__module__.split('.')[0] == 'polars':
+        data = data.to_arrow()
+
+    names = data.schema.names
+    classifier._check_variables(names, enable_ghi_mirroring)
+
+    if 'time' in names:
+        time_column = 'time'
+    else:
+        timestamps = [
+            field.name for field in data.schema if pa.types.is_timestamp(field.type)]
+        if len(timestamps) != 1:
+            raise ValueError('missing required variable: time (the UTC time stamps)')
+        time_column, = timestamps
+
+    result = classifier.classify_array(
+        _to_numpy(data.column(time_column)),
+        *[_to_numpy(data.column(name)) for name in classifier.REQUIRED],
+        longitude=_to_numpy(data.column('longitude')) if 'longitude' in names else None,
+        enable_ghi_mirroring=enable_ghi_mirroring,
+        full_output=full_output,
+        cleaning_pipeline=cleaning_pipeline,
+        n_jobs=n_jobs,
+        config=config,
+        compact=compact
+    )
+
+    if full_output is True:
+        return pa.table({
+            'sky_type': pa.array(result.pop('sky_type').astype(np.uint8)),
+            **{name: pa.array(values) for name, values in result.items()}
+        })
+    return pa.array(result.astype(np.uint8))
+
+
+def _to_numpy(column):
+    # NumPy view of an Arrow column (Array or ChunkedArray), or a copy if needed
+    chunks = getattr(column, 'chunks', [column])
+    if len(chunks) == 1 and chunks[0].null_count == 0:
+        values = chunks[0].to_numpy(zero_copy_only=False)
+    else:
+        logger.debug(f'copying an Arrow column of type {column.type}')
+        values = column.to_numpy(zero_copy_only=False)
+    if values.dtype.kind not in 'fM':
+        values = values.astype(np.float64)
+    return values
@@ -0,0 +1,95 @@
+import dataclasses
+import functools
+
+import pandas as pd
+
+from . import options
+
+
+@dataclasses.dataclass(frozen=True)
+class ClassifierConfig:
+    """
+    Immutable (and hashable) set of the classification settings: the max. solar
+    zenith angle, the rolling windows, the thresholds (Table 3) and the switches
+    of the cleaning filters (section 3.2). The fields are the lowercase names of
+    the settings in the options module, and the defaults are their original values.
+
+    Unlike the options module, a config is passed explicitly to `classify` (and to
+    the cleaning filters), so that several configs can be used at the same time,
+    e.g., in different threads. The modified copies are made with `replace`:
+
+        config = ClassifierConfig().replace(cloudless_max_kv=0.04)
+        sky_type = caelus.classify(data, config=config)
+    """
+
+    # max. solar zenith angle, degrees
+    max_sza: float = options.MAX_SZA
+
+    # moving average time windows
+    dt: str = options.DT
+    dt_f: str = options.DT_F
+
+    # thresholds (Table 3)
+    clouden_min_kcs: float = options.CLOUDEN_MIN_KCS
+    cloudless_min_km: float = options.CLOUDLESS_MIN_KM
+    cloudless_min_kcs: float = options.CLOUDLESS_MIN_KCS
+    cloudless_max_kcs: float = options.CLOUDLESS_MAX_KCS
+    thinclouds_min_km: float = options.THINCLOUDS_MIN_KM
+    thickclouds_max_km: float = options.THICKCLOUDS_MAX_KM
+    overcast_max_km: float = options.OVERCAST_MAX_KM
+    clouden_min_kv: float = options.CLOUDEN_MIN_KV
+    clouden_min_kvf: float = options.CLOUDEN_MIN_KVF
+    cloudless_max_kv: float = options.CLOUDLESS_MAX_KV
+    thinclouds_min_kv: float = options.THINCLOUDS_MIN_KV
+    thinclouds_max_kv: float = options.THINCLOUDS_MAX_KV
+    thickclouds_min_kv: float = options.THICKCLOUDS_MIN_KV
+    thickclouds_max_kv: float = options.THICKCLOUDS_MAX_KV
+    overcast_max_kv: float = options.OVERCAST_MAX_KV
+
+    # options for cleaning filters (section 3.2)
+    clean_spurious_sky_patches: bool = options.CLEAN_SPURIOUS_SKY_PATCHES
+    clean_scatter_clouds_flanked_by_thin_clouds: bool = \
+        options.CLEAN_SCATTER_CLOUDS_FLANKED_BY_THIN_CLOUDS
+    clean_cloudless_to_thin_clouds_transitions: bool = \
+        options.CLEAN_CLOUDLESS_TO_THIN_CLOUDS_TRANSITIONS
+    clean_thin_clouds_to_scatter_clouds_transitions: bool = \
+        options.CLEAN_THIN_CLOUDS_TO_SCATTER_CLOUDS_TRANSITIONS
+
+    @classmethod
+    def from_options(cls):
+        """
+        Config with the current values of the options module
+        """
+        return cls(**{
+            field.name: getattr(options, field.name.upper())
+            for field in dataclasses.fields(cls)
+        })
+
+    def replace(self, **changes):
+        """
+        Copy of the config with the fields in `changes` replaced
+        """
+        return dataclasses.replace(self, **changes)
+
+    # the windows are parsed once per config, since they are read at every
+    # classification (and a frozen dataclass still has an instance __dict__)
+    @functools.cached_property
+    def window(self):
+        """
+        Length of the rolling window of the mean ghi and Kv (dt), in ns
+        """
+        return pd.Timedelta(self.dt).value
+
+    @functools.cached_property
+    def window_f(self):
+        """
+        Length of the rolling window of Kvf (dt_f), in ns
+        """
+        return pd.Timedelta(self.dt_f).value
+
+
+def resolve_config(config):
+    """
+    The config `config` or, if None, the current values of the options module
+    """
+    return ClassifierConfig.from_options() if config is None else config
@@ -0,0 +1,137 @@
+import numpy as np
+
+from loguru import logger
+
+from . import chunking, kernels
+from .config import resolve_config
+from .classifier import REQUIRED, _check_variables
+from .panel import _classify_panel
+
+
+logger.disable(__name__)
+
+
+def classify_cube(data, enable_ghi_mirroring=True, cleaning_pipeline=None, config=None,
+                  time_dim='time', longitude='longitude'):
+    """
+    Classifies a gridded data cube (e.g., satellite-derived ghi over (time, lat,
+    lon)) out of core, with dask.
+
+    The cube is split into chunks along time that are classified independently of
+    each other (with dask's map_overlap), each one with a halo at both sides (see
+    chunking.overlap_reach), and with all the pixels of a chunk
+    classified at once (see classify_panel). Thus, the memory is bounded by the
+    size of the chunks (with halo), and the sky types are the same whatever the
+    chunks, as long as the pixels have night time every day (the cleaning filters
+    do not go across nights). They are those of `classify` on each pixel but for
+    the ties at the thresholds (see `classify`).
+
+    Parameters:
+    -----------
+
+    data: xarray Dataset
+      the variables `sza`, `eth`, `ghi`, `ghics` and `ghicda`, as in `classify`,
+      with the same dimensions. They may be chunked with dask along any dimension,
+      but they are rechunked along time to a multiple of the halo
+      (kernels.PREFIX_BLOCK_SIZE time steps, at least)
+
+    enable_ghi_mirroring, cleaning_pipeline, config:
+      as in `classify`
+
+    time_dim: str
+      the time dimension, whose UTC time stamps must be equally spaced (the
+      missing time stamps must be filled with NaN)
+
+    longitude: str
+      the name of the variable (or coordinate) in `data` with the longitude of
+      the pixels, in degrees. Only required for the ghi mirroring
+
+    Returns:
+    --------
+
+    A lazy (dask-backed) xarray DataArray `sky_type` of uint8 labels, with the
+    dimensions of `ghi`, e.g., to be written to a chunked store with
+    `.to_zarr(store)`.
+    """
+    import dask.array as da  # pylint: disable=import-outside-toplevel
+
+    config = resolve_config(config)
+    _check_variables(data.variables, enable_ghi_mirroring, longitude)
+
+    unit = kernels.time_unit(data[time_dim].values)
+    times = kernels.as_epoch_ns(data[time_dim].values)
+    steps = np.diff(times)
+    if times.size < 2 or steps[0] <= 0 or np.any(steps != steps[0]):
+        raise ValueError(f'the time stamps of `{time_dim}` must be equally spaced '
+                         '(fill the missing ones with NaN)')
+
+    # the chunks must start at the blocks of the prefix sums of the whole series
+    # (see kernels.regular_window_sums) and be longer than their halo
+    depth = chunking.overlap_reach(int(steps[0]), config) // int(steps[0])
+    chunk_size = data['ghi'].chunksizes.get(time_dim, (depth,))[0]
+    chunk_size = -(-chunk_size // depth) * depth
+    if chunk_size >= times.size:
+        chunk_size, depth = times.size, 0
+    # a last chunk shorter than the halo is merged with the previous one (dask
+    # would otherwise rebalance the chunks, which would no longer start at blocks)
+    time_chunks = [chunk_size] * (times.size // chunk_size)
+    if remainder := times.size % chunk_size:
+        if remainder < depth:
+            time_chunks[-1] += remainder
+        else:
+            time_chunks.append(remainder)
+    time_chunks = tuple(time_chunks)
+    logger.debug(f'time chunks of {chunk_size} time steps, with a halo of {depth}')
+
+    dims = [dim for dim in data['ghi'].dims if dim != time_dim] + [time_dim]
+    data = data.chunk({time_dim: time_chunks})
+    arrays = [data[name].transpose(*dims).data for name in REQUIRED]
+    arrays = [x.rechunk(arrays[2].chunks) for x in arrays]
+    spatial_chunks = arrays[2].chunks[:-1]
+
+    n_spatial = len(dims) - 1
+    args = arrays + [
+        da.from_array(
+            times.reshape((1,) * n_spatial + (-1,)),
+            chunks=(1,) * n_spatial + (time_chunks,)
+        )
+    ]
+    halo = dict.fromkeys(range(n_spatial), 0)
+    depths = [{**halo, n_spatial: depth}] * len(args)
+    if enable_ghi_mirroring is True:
+        lon = data[longitude]
+        if time_dim in lon.dims:
+            lon = lon.isel({time_dim: 0}, drop=True)
+        lon = lon.broadcast_like(data['ghi'].isel({time_dim: 0}, drop=True))
+        args.append(da.from_array(
+            np.asarray(lon.transpose(*dims[:-1]).values, dtype=np.float64)[..., None],
+            chunks=spatial_chunks + (1,)
+        ))
+        depths.append({**halo, n_spatial: 0})
+
+    sky_type = da.map_overlap(
+        _classify_block, *args, depth=depths, boundary='none', dtype=np.uint8,
+        enable_ghi_mirroring=enable_ghi_mirroring, cleaning_pipeline=cleaning_pipeline,
+        config=config, grid=(int(times[0]), int(steps[0])), unit=unit
+    )
+    result = data['ghi'].transpose(*dims).copy(data=sky_type).rename('sky_type')
+    result.attrs = {}
+    return result.transpose(*data['ghi'].dims)
+
+
+def _classify_block(sza, eth, ghi, ghics, ghicda, times, longitude=None, *,
+                    enable_ghi_mirroring, cleaning_pipeline, config, grid, unit):
+    # classifies a block of the cube (pixels x time, with its halo)
+    shape = ghi.shape
+    if not ghi.size:
+        return np.empty(shape, dtype=np.uint8)
+
+    def rows(x):
+        return np.reshape(x, (-1, shape[-1]))
+
+    sky_type = _classify_panel(
+        times.reshape(-1), rows(sza), rows(eth), rows(ghi), rows(ghics), rows(ghicda),
+        None if longitude is None else longitude.reshape(-1), enable_ghi_mirroring,
+        cleaning_pipeline, config, grid, unit
+    )
+    return sky_type.reshape(shape)
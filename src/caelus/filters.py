@@ -1,282 +1,407 @@
-
+import numpy as np
 import pandas as pd
 
 from loguru import logger
 
+from . import kernels
+from .config import ClassifierConfig, resolve_config
 from .skytype import SkyType
+from .segments import NO_SEGMENT, SegmentTable
 
 
 logger.disable(__name__)
 
 
-def sky_segmentation(sky_type):
-    """
-    Detects changes of sky type and assigns incremental labels (integers)
-    to all time steps corresponding to the new sky type (segments).
-
-    For instance, given the following sequence of sky types:
-
-        [2, 2, 2, 4, 4, 5, 5, 5, 5, 5, 3, 4, 4]
-
-    the segmentation is:
-
-        [0, 0, 0, 1, 1, 2, 2, 2, 2, 2, 3, 4, 4]
-    """
-    sky_segments = (
-        (sky_type != sky_type.shift(-1)).shift(1, fill_value=0).cumsum())
-    sky_segments = pd.DataFrame(data={'segment': sky_segments})
-    sky_segments['sky_type'] = sky_type
-    return sky_segments
-
-
-def reduce_sky_segments(sky_segments):
-    """
-    Summarizes the series of segments into a table of sky patches.
-
-    Each entry in the table (i.e., each row) is referred to as a patch.
-    A patch is made up by the segment label, its sky type, its length,
-    and the previous and next sky types, and their own lengths.
-
-    For instance, for the example shown in sky_segmentation, the sky
-    patches are:
-
-    segment  sky_type  segment      prev         prev      next         next
-                           len  sky_type  segment_len  sky_type  segment_len
-    0               2        3       NaN          NaN         1            2
-    1               4        2         2            3         5            5
-    2               5        5         4            2         3            1
-    3               3        1         5            5         4            2
-    4               4        2         3            1       NaN          NaN
-    """
-
-    def reduce_sky_type(x):
-        return x['sky_type'].unique().item()
-
-    grouper = sky_segments.groupby('segment')  # [sky_segments.columns]
-    sky_patches = grouper.apply(reduce_sky_type, include_groups=False).to_frame(name='sky_type')
-    sky_patches['segment_len'] = grouper.count()
-    sky_patches['prev_sky_type'] = sky_patches['sky_type'].shift(1)
-    sky_patches['prev_segment_len'] = sky_patches['segment_len'].shift(1)
-    sky_patches['next_sky_type'] = sky_patches['sky_type'].shift(-1)
-    sky_patches['next_segment_len'] = sky_patches['segment_len'].shift(-1)
-    return sky_patches
-
-
-def clean_spurious_sky_patches(sky_type, min_sky_patch_len=15, max_iter=20):
+def clean_spurious_sky_patches(segments, min_sky_patch_len=15, max_iter=20):
     """
     Removes spurious sky patches in the following sky transitions:
       1. From scatter_clouds or thick_clouds to anything different from
          cloud_enhancements
       2. Between thin_clouds and cloudless skies, and viceversa
     A sky patch is spurious when its length is shorter than `min_sky_path_len`
-    """
-    logger.info('clean spurious sky patches...')
-
-    remaining_iter = max_iter
-    polished_sky_type = sky_type.copy()
 
-    while remaining_iter:
+    The spurious patches are removed in iterations, all of them at once in each
+    iteration, until there are no spurious patches left or `max_iter` iterations
+    are done. The segments form a linked list in which each spurious patch is
+    merged into its neighbours, and only the segments next to a merge are
+    reviewed in the following iteration, since the rest remain unchanged.
 
-        sky_segments = sky_segmentation(polished_sky_type)
-        sky_patches = reduce_sky_segments(sky_segments)
+    segments: SegmentTable
+      the sky segments to clean
 
-        sky_patches['polished'] = sky_patches['sky_type']
-
-        is_known = sky_patches['sky_type'] != SkyType.UNKNOWN
-
-        is_spurious = (
-            (sky_patches['segment_len'] < min_sky_patch_len) &
-            (
-                (sky_patches['prev_segment_len'] >= min_sky_patch_len) |
-                (sky_patches['next_segment_len'] >= min_sky_patch_len)
-            )
-        )
+    Returns a new SegmentTable with the cleaned sky segments.
+    """
+    logger.info('clean spurious sky patches...')
 
-        # remove spurious transitions from scatter_clouds or thick_clouds
-        # to anything different from cloud_enhancements
-        condition = (
-            is_known & is_spurious &
-            (sky_patches['prev_sky_type'] == sky_patches['next_sky_type']) &
-            (sky_patches['sky_type'] != SkyType.CLOUD_ENHANCEMENT) &
-            (
-                (sky_patches['prev_sky_type'] == SkyType.SCATTER_CLOUDS) |
-                (sky_patches['prev_sky_type'] == SkyType.THICK_CLOUDS)
-            )
-        )
-        sky_patches.loc[condition, 'polished'] = sky_patches['prev_sky_type']
+    n_segments = len(segments)
+    sky_type = segments.sky_type.copy()
+    length = segments.length.copy()
+    alive = np.ones(n_segments, dtype=bool)
+    # linked list of segments, with -1 for missing neighbours
+    prev_segment = np.arange(-1, n_segments - 1)
+    next_segment = np.arange(1, n_segments + 1)
+    next_segment[-1:] = -1
 
-        # remove spurious transitions thin_clouds <=> cloudless transitions
-        condition = (
-            is_known & is_spurious &
-            (sky_patches['prev_sky_type'] == sky_patches['next_sky_type']) &
-            (
-                (sky_patches['sky_type'] == SkyType.THIN_CLOUDS) |
-                (sky_patches['sky_type'] == SkyType.CLOUDLESS)
-            ) &
-            (
-                (sky_patches['prev_sky_type'] == SkyType.THIN_CLOUDS) |
-                (sky_patches['prev_sky_type'] == SkyType.CLOUDLESS)
-            )
-        )
-        sky_patches.loc[condition, 'polished'] = sky_patches['prev_sky_type']
+    n_updated = 0
+    remaining_iter = max_iter
+    worklist = np.arange(n_segments)
 
-        new_polished_sky_type = pd.Series(
-            index=polished_sky_type.index, name='polished',
-            data=sky_patches.loc[sky_segments['segment'], 'polished'].values
-        )
+    while remaining_iter and worklist.size:
 
-        updated_values = sum(polished_sky_type != new_polished_sky_type)
-        polished_sky_type = new_polished_sky_type
+        polished = worklist[
+            _is_spurious_sky_patch(
+                worklist, prev_segment, next_segment, sky_type, length, min_sky_patch_len)
+        ]
+        updated_values = int(length[polished].sum())
 
         if not updated_values:
             break
 
+        # all the spurious patches are relabelled at once...
+        sky_type[polished] = sky_type[prev_segment[polished]]
+
+        # ...and then merged with their neighbours, from left to right
+        merged = []
+        for segment in polished.tolist():
+            if not alive[segment]:
+                continue  # already merged into a previous segment
+            other = prev_segment[segment]
+            while other != -1 and sky_type[other] == sky_type[segment]:
+                segment, other = other, prev_segment[other]
+            other = next_segment[segment]
+            while other != -1 and sky_type[other] == sky_type[segment]:
+                length[segment] += length[other]
+                alive[other] = False
+                other = next_segment[other]
+            next_segment[segment] = other
+            if other != -1:
+                prev_segment[other] = segment
+            merged.append(segment)
+
+        merged = np.array(merged)
+        worklist = np.concatenate([merged, prev_segment[merged], next_segment[merged]])
+        worklist = np.unique(worklist[worklist != -1])
+
+        n_updated += updated_values
+
         remaining_iter -= 1
 
         logger.debug(
             f'iter={max_iter-remaining_iter}: {updated_values} '
             f'updated values, {remaining_iter} iterations remaining')
 
-    updated_values = sum(sky_type != polished_sky_type)
     logger.info(
         f'  {max_iter-remaining_iter} iterations: '
-        f'{updated_values} updated values')
+        f'{n_updated} updated values')
+
+    return SegmentTable(segments.start[alive], length[alive], sky_type[alive])
+
+
+def _is_spurious_sky_patch(segment, prev_segment, next_segment, sky_type, length,
+                           min_sky_patch_len):
+    # which of the segments in `segment` are spurious sky patches to be removed,
+    # with missing neighbours treated as NO_SEGMENT
+    prev, next_ = prev_segment[segment], next_segment[segment]
+    has_prev, has_next = prev != -1, next_ != -1
+    prev_sky_type = np.where(has_prev, sky_type[prev], NO_SEGMENT)
+    next_sky_type = np.where(has_next, sky_type[next_], NO_SEGMENT)
+    prev_length = np.where(has_prev, length[prev], NO_SEGMENT)
+    next_length = np.where(has_next, length[next_], NO_SEGMENT)
+    sky_type = sky_type[segment]
+
+    is_known = sky_type != SkyType.UNKNOWN
+
+    is_spurious = (
+        (length[segment] < min_sky_patch_len) &
+        (
+            (prev_length >= min_sky_patch_len) |
+            (next_length >= min_sky_patch_len)
+        )
+    )
+
+    # remove spurious transitions from scatter_clouds or thick_clouds
+    # to anything different from cloud_enhancements
+    condition1 = (
+        is_known & is_spurious &
+        (prev_sky_type == next_sky_type) &
+        (sky_type != SkyType.CLOUD_ENHANCEMENT) &
+        (
+            (prev_sky_type == SkyType.SCATTER_CLOUDS) |
+            (prev_sky_type == SkyType.THICK_CLOUDS)
+        )
+    )
+
+    # remove spurious transitions thin_clouds <=> cloudless transitions
+    condition2 = (
+        is_known & is_spurious &
+        (prev_sky_type == next_sky_type) &
+        (
+            (sky_type == SkyType.THIN_CLOUDS) |
+            (sky_type == SkyType.CLOUDLESS)
+        ) &
+        (
+            (prev_sky_type == SkyType.THIN_CLOUDS) |
+            (prev_sky_type == SkyType.CLOUDLESS)
+        )
+    )
 
-    return polished_sky_type
+    return condition1 | condition2
 
 
-def clean_scatter_clouds_flanked_by_thin_clouds(sky_type, dt, sza, Km, Kv):
+def clean_scatter_clouds_flanked_by_thin_clouds(segments, times, dt, sza, Km, Kv):
     """
     Convert to thin_clouds all scatter_clouds patches that are longer than
     25 minutes and shorter than 35 minutes, and that are flanked by thin_clouds,
     unless they meet the conditions set below in the code (and that are also
     in section 3.2 in the paper)
-    """
-    logger.info('clean scatter_clouds flanked by thin_clouds...')
 
-    sky_segments = sky_segmentation(sky_type)
-    sky_patches = reduce_sky_segments(sky_segments)
+    segments: SegmentTable
+      the sky segments to clean
 
-    rollwin = Kv.rolling(dt, center=True)
-    A = rollwin.mean() / rollwin.max()
+    times: array of datetime64 (or int64 nanoseconds since epoch)
+      the time stamps of the sky type series
 
-    # CONDITIONS TO REMAIN AS SCATTER_CLOUDS: these conditions select mostly
-    # scatter_clouds, but also other sky types, such as cloud_enhancements.
-    # However, they are applied below only to sky patches that are scatter_clouds
-    candidates = (sza < 70.) & (Km > 0.7) & (Kv > 0.1) & (A > 0.9)
+    dt: str or Timedelta
+      the length of the centered rolling window
+
+    sza, Km, Kv: float arrays
+      the solar zenith angle and the variability indices at each time step
 
-    candidate_segments = sky_segments.loc[candidates, 'segment'].unique()
-    sky_patches = sky_patches.loc[candidate_segments]
+    Returns a new SegmentTable with the cleaned sky segments.
+    """
+    logger.info('clean scatter_clouds flanked by thin_clouds...')
 
-    # Amongst all "candidate segments", selects only the ones that
-    # are scatter_clouds, not too long or too short, and that are
-    # flanked by thin_clouds on both sides
-    target_sky_patches = (
-        (sky_patches['sky_type'] == SkyType.SCATTER_CLOUDS) &
+    # selects the scatter_clouds segments that are not too long or too
+    # short, and that are flanked by thin_clouds on both sides
+    target_segments = np.flatnonzero(
+        (segments.sky_type == SkyType.SCATTER_CLOUDS) &
         (
-            (sky_patches['segment_len'] > 25) &
-            (sky_patches['segment_len'] < 35)
+            (segments.length > 25) &
+            (segments.length < 35)
         ) &
         (
-            (sky_patches['prev_sky_type'] == SkyType.THIN_CLOUDS) &
-            (sky_patches['next_sky_type'] == SkyType.THIN_CLOUDS)
+            (segments.prev_sky_type == SkyType.THIN_CLOUDS) &
+            (segments.next_sky_type == SkyType.THIN_CLOUDS)
         )
     )
+    positions, group = segments.positions(target_segments)
 
-    # all `target_sky_patches` are scatter_clouds...
-    sky_patches = sky_patches.loc[target_sky_patches]
-
-    new_sky_type = sky_type.copy()
-    target_segments = sky_segments['segment'].isin(sky_patches.index)
+    # CONDITIONS TO REMAIN AS SCATTER_CLOUDS: these conditions select mostly
+    # scatter_clouds, but also other sky types, such as cloud_enhancements.
+    # However, they are applied below only to sky patches that are scatter_clouds
+    candidates = (sza[positions] < 70.) & (Km[positions] > 0.7) & (Kv[positions] > 0.1)
+    candidates[candidates] = _amplitude_ratio(
+        segments, target_segments[np.unique(group[candidates])], positions[candidates],
+        times, dt, Kv
+    ) > 0.9
+
+    # Amongst the target segments, selects only the "candidate segments"
+    candidate_segments = np.bincount(
+        group[candidates], minlength=target_segments.size) > 0
+    keep = candidate_segments[group]
+    target_segments = target_segments[candidate_segments]
+    positions, candidates = positions[keep], candidates[keep]
 
     # convert all the `target_sky_patches` to thin_clouds, but keep as
     # scatter_clouds those that verify the conditions in `candidates`
-    new_sky_type.loc[target_segments] = SkyType.THIN_CLOUDS
-    new_sky_type.loc[target_segments & candidates] = SkyType.SCATTER_CLOUDS
+    new_sky_type = np.where(candidates, SkyType.SCATTER_CLOUDS, SkyType.THIN_CLOUDS)
 
-    logger.info(f'  {len(sky_patches)} sky patches updated '
-                f'({(target_segments & candidates).sum()} time steps)')
+    logger.info(f'  {len(target_segments)} sky patches updated '
+                f'({candidates.sum()} time steps)')
 
-    return new_sky_type
+    return segments.patch(target_segments, new_sky_type)
 
 
-def clean_cloudless_to_thin_clouds_transitions(sky_type, Kv):
+def _amplitude_ratio(segments, target_segments, positions, times, dt, Kv):
+    # ratio between the rolling mean and max of Kv at `positions` (sorted), which
+    # lie in the target segments. Each segment takes its own slice of Kv, which
+    # includes a halo of half a window at each side
+    times = kernels.as_epoch_ns(times)
+    window = pd.Timedelta(dt).value
+    A = np.empty(positions.size)
+    for start, end in zip(segments.start[target_segments], segments.end[target_segments]):
+        lo = np.searchsorted(times, times[start] - window // 2, side='right')
+        hi = np.searchsorted(times, times[end - 1] + window // 2, side='right')
+        mean, max_ = kernels.window_mean_max(times[lo:hi], Kv[lo:hi], window)
+        first, last = np.searchsorted(positions, [start, end])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            A[first:last] = (mean / max_)[positions[first:last] - lo]
+    return A
+
+
+def clean_cloudless_to_thin_clouds_transitions(segments, Kv):
     """
     Downgrade cloudless patches that are potentially thin_clouds. Normally,
     it benefits the predictions with gisplit
+
+    segments: SegmentTable
+      the sky segments to clean
+
+    Kv: float array
+      the variability index at each time step
+
+    Returns a new SegmentTable with the cleaned sky segments.
     """
     logger.info('reviewing cloudless => thin_clouds transitions')
 
-    sky_segments = sky_segmentation(sky_type)
-    sky_patches = reduce_sky_segments(sky_segments)
-
     cloudless_candidates = (
-        (sky_patches['sky_type'] == SkyType.CLOUDLESS)
-        & (sky_patches['prev_sky_type'] == SkyType.THIN_CLOUDS)
-        & (sky_patches['next_sky_type'] == SkyType.THIN_CLOUDS)
-        & (sky_patches['segment_len'] < 20)  # +++ UPDATED > TO <
+        (segments.sky_type == SkyType.CLOUDLESS)
+        & (segments.prev_sky_type == SkyType.THIN_CLOUDS)
+        & (segments.next_sky_type == SkyType.THIN_CLOUDS)
+        & (segments.length < 20)  # +++ UPDATED > TO <
         & (
             (
-                (sky_patches['prev_segment_len'] +
-                 sky_patches['next_segment_len']) >
-                0.5*sky_patches['segment_len']
+                (segments.prev_length +
+                 segments.next_length) >
+                0.5*segments.length
             )
           )
     )
 
-    n_updates = 0
-    new_sky_type = sky_type.copy()
-    for segment in sky_patches.loc[cloudless_candidates].index:
-        domain = sky_segments['segment'] == segment
-        q25 = Kv.loc[domain].quantile(q=0.25)
-        segment_data = sky_segments.loc[domain]
-        logger.debug(f'segment {segment}: [{segment_data.index[0]}, '
-                     f'{segment_data.index[-1]}], {len(segment_data)} steps')
-        if q25 >= 0.01:
-            new_sky_type.loc[domain] = SkyType.THIN_CLOUDS
-            n_updates += 1
+    target_segments = np.flatnonzero(cloudless_candidates)
+    q25 = segments.quantile(Kv, q=0.25, segments=target_segments)
+    target_segments = target_segments[q25 >= 0.01]
 
-    logger.info(f'  {n_updates} segments updated')
+    new_sky_type = segments.sky_type.copy()
+    new_sky_type[target_segments] = SkyType.THIN_CLOUDS
 
-    return new_sky_type
+    logger.info(f'  {target_segments.size} segments updated')
 
+    return segments.relabel(new_sky_type)
 
-def clean_thin_clouds_to_scatter_clouds_transitions(sky_type, Kv):
+
+def clean_thin_clouds_to_scatter_clouds_transitions(segments, Kv):
     """
     Downgrade thin_clouds patches that are potentially scatter_clouds.
     Normally, it improves the predictions with gisplit
+
+    segments: SegmentTable
+      the sky segments to clean
+
+    Kv: float array
+      the variability index at each time step
+
+    Returns a new SegmentTable with the cleaned sky segments.
     """
     logger.info('reviewing thin_clouds => scatter_clouds transitions')
 
-    sky_segments = sky_segmentation(sky_type)
-    sky_patches = reduce_sky_segments(sky_segments)
-
     cloudless_candidates = (
-        (sky_patches['sky_type'] == SkyType.THIN_CLOUDS)
-        & (sky_patches['prev_sky_type'] == SkyType.SCATTER_CLOUDS)
-        & (sky_patches['next_sky_type'] == SkyType.SCATTER_CLOUDS)
-        & (sky_patches['segment_len'] > 20)
+        (segments.sky_type == SkyType.THIN_CLOUDS)
+        & (segments.prev_sky_type == SkyType.SCATTER_CLOUDS)
+        & (segments.next_sky_type == SkyType.SCATTER_CLOUDS)
+        & (segments.length > 20)
         & (
             (
-                (sky_patches['prev_segment_len'] +
-                 sky_patches['next_segment_len']) >
-                0.5*sky_patches['segment_len']
+                (segments.prev_length +
+                 segments.next_length) >
+                0.5*segments.length
             )
           )
     )
 
-    n_updates = 0
-    new_sky_type = sky_type.copy()
-    for segment in sky_patches.loc[cloudless_candidates].index:
-        domain = sky_segments['segment'] == segment
-        q75 = Kv.loc[domain].quantile(q=0.75)
-        segment_data = sky_segments.loc[domain]
-        logger.debug(f'segment {segment}: [{segment_data.index[0]}, '
-                     f'{segment_data.index[-1]}], {len(segment_data)} steps')
-        if q75 >= 0.04:
-            new_sky_type.loc[domain] = SkyType.SCATTER_CLOUDS
-            n_updates += 1
-
-    logger.info(f'  {n_updates} segments updated')
-
-    return new_sky_type
+    target_segments = np.flatnonzero(cloudless_candidates)
+    q75 = segments.quantile(Kv, q=0.75, segments=target_segments)
+    target_segments = target_segments[q75 >= 0.04]
+
+    new_sky_type = segments.sky_type.copy()
+    new_sky_type[target_segments] = SkyType.SCATTER_CLOUDS
+
+    logger.info(f'  {target_segments.size} segments updated')
+
+    return segments.relabel(new_sky_type)
+
+
+class CleaningPipeline:
+    """
+    Sequence of cleaning stages that share a single segment table.
+
+    The sky type series is segmented once, each stage patches the segment table
+    left by the previous one, and the sky type of each time step is only
+    materialized at the end. A stage is any callable `stage(segments, data)` that
+    returns the cleaned SegmentTable, where `data` is a dict with the time stamps
+    (`times`, int64 nanoseconds since epoch), the arrays `sza`, `ghi`, `Km`, `Kv`
+    and `Kvf`, and the ClassifierConfig of the classification (`config`). For
+    instance:
+
+        pipeline = CleaningPipeline.from_options()
+
+        @pipeline.register
+        def clean_short_overcast_patches(segments, data):
+            ...
+            return segments
+
+        sky_type = caelus.classify(data, cleaning_pipeline=pipeline)
+    """
+
+    def __init__(self, stages=None):
+        self.stages = []
+        for stage in stages or []:
+            self.register(stage)
+
+    @classmethod
+    def from_options(cls):
+        """
+        Pipeline with the cleaning filters enabled in the options module
+        (section 3.2), in the order in which they are applied by `classify`
+        """
+        return cls.from_config(ClassifierConfig.from_options())
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Pipeline with the cleaning filters enabled in `config`, a ClassifierConfig
+        (section 3.2), in the order in which they are applied by `classify`
+        """
+        stages = [
+            stage for enabled, stage in (
+                (config.clean_spurious_sky_patches,
+                 _clean_spurious_sky_patches),
+                (config.clean_scatter_clouds_flanked_by_thin_clouds,
+                 _clean_scatter_clouds_flanked_by_thin_clouds),
+                (config.clean_cloudless_to_thin_clouds_transitions,
+                 _clean_cloudless_to_thin_clouds_transitions),
+                (config.clean_thin_clouds_to_scatter_clouds_transitions,
+                 _clean_thin_clouds_to_scatter_clouds_transitions)
+            )
+            if enabled is True
+        ]
+        return cls(stages)
+
+    def register(self, stage):
+        """
+        Appends `stage` to the pipeline. It returns the stage, so that it can
+        also be used as a decorator
+        """
+        if not callable(stage):
+            raise TypeError(f'cleaning stages must be callable, got {stage!r}')
+        self.stages.append(stage)
+        return stage
+
+    def run(self, sky_type, **data):
+        """
+        Runs all the stages on the sky type series `sky_type` (int array) and
+        returns the cleaned sky type series
+        """
+        segments = SegmentTable.from_sky_type(sky_type)
+        for stage in self.stages:
+            logger.debug(f'cleaning stage {getattr(stage, "__name__", stage)}')
+            segments = stage(segments, data)
+        return segments.to_sky_type()
+
+
+def _clean_spurious_sky_patches(segments, data):
+    return clean_spurious_sky_patches(segments, min_sky_patch_len=15, max_iter=50)
+
+
+def _clean_scatter_clouds_flanked_by_thin_clouds(segments, data):
+    return clean_scatter_clouds_flanked_by_thin_clouds(
+        segments, data['times'], resolve_config(data.get('config')).dt, data['sza'],
+        data['Km'], data['Kv'])
+
+
+def _clean_cloudless_to_thin_clouds_transitions(segments, data):
+    return clean_cloudless_to_thin_clouds_transitions(segments, data['Kv'])
+
+
+def _clean_thin_clouds_to_scatter_clouds_transitions(segments, data):
+    return clean_thin_clouds_to_scatter_clouds_transitions(segments, data['Kv'])
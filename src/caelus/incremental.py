@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from . import chunking, kernels
+from .classifier import REQUIRED, _check_variables, _classify_array, classify
+from .config import resolve_config
+
+
+logger.disable(__name__)
+
+def reclassify(data, previous, modified, enable_ghi_mirroring=True,
+               cleaning_pipeline=None, config=None):
+    """
+    Classifies the Pandas DataFrame `data` after the correction of its data in
+    the time ranges `modified`, from its classification before the corrections,
+    `previous`. Only the time steps whose sky type may change (see dirty_span) are
+    classified again, with the halo of data of a chunk (see chunking.halo_start),
+    and they are spliced into `previous`, so that the result is the same as
+    `classify` on the whole corrected data but for the ties at the thresholds of
+    the classifications in chunks (see `classify`).
+
+    data: Pandas DataFrame
+      the corrected time series, with the variables required by `classify`
+
+    previous: Pandas Series or DataFrame
+      the output of `classify` (a DataFrame, with full_output) on the data before
+      the corrections, with the same time stamps as `data` and the same
+      enable_ghi_mirroring, cleaning_pipeline and config. Its dtypes are kept
+      (e.g., with compact=True)
+
+    modified: list of (start, end) tuples
+      the UTC time ranges (both ends included) of the corrected data, as anything
+      that pandas.Timestamp takes
+
+    enable_ghi_mirroring, cleaning_pipeline, config:
+      as in `classify`
+
+    Returns a new Pandas Series (or DataFrame, if `previous` is a DataFrame).
+    """
+    _check_variables(data.columns, enable_ghi_mirroring)
+    if not previous.index.equals(data.index):
+        raise ValueError('the previous classification must have the time stamps of data')
+
+    config = resolve_config(config)
+    full_output = isinstance(previous, pd.DataFrame)
+
+    times = kernels.as_epoch_ns(data.index.values)
+    step = kernels.grid_step(times)
+    if step is None:
+        logger.warning('the time stamps are not on a regular grid: '
+                       'the whole series is classified again')
+        result = classify(
+            data, enable_ghi_mirroring, full_output, cleaning_pipeline, config=config)
+        return result.astype(previous.dtypes if full_output else previous.dtype)
+
+    grid = (times[0], step)
+    unit = kernels.time_unit(data.index.values)
+    sza, eth, ghi, ghics, ghicda = [data[name].to_numpy(dtype=np.float64) for name in REQUIRED]
+    longitude = data['longitude'].to_numpy(dtype=np.float64) \
+        if enable_ghi_mirroring is True else None
+
+    spans = []
+    for start, end in modified:
+        first = np.searchsorted(times, pd.Timestamp(start).value, side='left')
+        last = np.searchsorted(times, pd.Timestamp(end).value, side='right')
+        if first < last:
+            spans.append(dirty_span(
+                times, sza, longitude, grid, first, last, enable_ghi_mirroring, config))
+
+    columns = (
+        {name: previous[name].to_numpy(copy=True) for name in previous.columns}
+        if full_output else {'sky_type': previous.to_numpy(copy=True)}
+    )
+    for start, end in _merge(spans):
+        lo = chunking.halo_start(times, grid, start, longitude, enable_ghi_mirroring, config)
+        hi = chunking.halo_end(times, grid, end, longitude, enable_ghi_mirroring, config)
+        logger.info(f'classifying the time steps {start} to {end - 1} '
+                    f'(with the halo, {lo} to {hi - 1})')
+        result = _classify_array(
+            *[x[lo:hi] for x in (times, sza, eth, ghi, ghics, ghicda)],
+            longitude if longitude is None else longitude[lo:hi],
+            enable_ghi_mirroring, full_output, cleaning_pipeline, config, grid, unit
+        )
+        if full_output is False:
+            result = {'sky_type': result}
+        for name, values in columns.items():
+            values[start:end] = result[name][start - lo:end - lo]
+
+    if full_output is True:
+        return pd.DataFrame(index=previous.index, data=columns)
+    return pd.Series(index=previous.index, data=columns['sky_type'], name=previous.name)
+
+
+def dirty_span(times, sza, longitude, grid, first, end, enable_ghi_mirroring=True,
+               config=None):
+    """
+    Time steps [start, end) whose sky type and variability indices may change
+    with the data of the time steps [first, end), in a time series on the regular
+    grid `grid` (see chunking.plan_chunks for the other arguments).
+
+    These are the time steps whose halo (see chunking.halo_start and halo_end)
+    takes the true solar days of the data (with ghi mirroring, which uses all the
+    data of each day), and those of the sky patches whose amplitude ratio takes
+    their Kv (see filters._amplitude_ratio), up to the nearest night time steps
+    (sza > max_sza) at both sides, which isolate the cleaning filters.
+    """
+    config = resolve_config(config)
+    origin, step = grid
+    size = kernels.PREFIX_BLOCK_SIZE
+    before, after = chunking.window_reach(step, config)
+
+    if enable_ghi_mirroring is True:
+        first = chunking.day_start(times, longitude, first)
+        end = chunking.day_end(times, longitude, end - 1)
+
+    # halo_end takes the data up to forward_reach after the chunk, and halo_start
+    # from one block before the block of the first rolling window of the chunk
+    start = np.searchsorted(
+        times, times[first] - chunking.forward_reach(step, config), side='left')
+    position = (times[end - 1] - origin) // step
+    last = ((position + before + 1) // size + 2) * size + after
+    end = np.searchsorted(times, origin + last * step, side='left')
+
+    window = max(config.window, config.window_f)
+    start = np.searchsorted(times, times[start] - window, side='left')
+    end = np.searchsorted(times, times[end - 1] + window, side='right')
+
+    night = np.flatnonzero(~(sza <= config.max_sza))
+    k = np.searchsorted(night, start, side='right')
+    start = night[k - 1] if k > 0 else 0
+    k = np.searchsorted(night, end, side='left')
+    end = night[k] if k < night.size else times.size
+    return int(start), int(end)
+
+
+def _merge(spans):
+    # union of the [start, end) spans, as sorted disjoint spans
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
@@ -0,0 +1,428 @@
+import numpy as np
+import pandas as pd
+
+
+# number of time steps per block in the blocked prefix sums. Prefix sums are
+# restarted at every block to keep their magnitude (and, hence, the round-off
+# error of their differences) independent of the length of the time series
+PREFIX_BLOCK_SIZE = 4096
+
+# max. ratio between the size of the regular grid and the number of time steps
+# to run the integer-window kernels on time series with data gaps
+MAX_GRID_FILL_RATIO = 2.
+
+
+def as_epoch_ns(times):
+    """
+    Converts an array of datetime64 values (or of int64 nanoseconds since
+    epoch) to a contiguous int64 array of nanoseconds since epoch
+    """
+    times = np.asarray(times)
+    if times.dtype.kind == 'M':
+        times = times.astype('datetime64[ns]', copy=False).view(np.int64)
+    return np.ascontiguousarray(times, dtype=np.int64)
+
+
+def time_unit(times):
+    """
+    Nanoseconds per unit of the time stamps `times` as given: that of their
+    datetime64 dtype (e.g., 1000 for datetime64[us]), or 1 for int64 nanoseconds
+    """
+    times = np.asarray(times)
+    if times.dtype.kind != 'M':
+        return 1
+    unit, count = np.datetime_data(times.dtype)
+    return int(np.timedelta64(count, unit) // np.timedelta64(1, 'ns'))
+
+
+def grid_step(times):
+    """
+    Time step (ns) of the regular grid that contains all the time stamps in
+    `times`, or None if the time stamps are not on a regular grid (or the grid
+    would be too sparse, see MAX_GRID_FILL_RATIO)
+    """
+    if times.size < 2:
+        return None
+    steps = np.diff(times)
+    step = int(steps.min())
+    if step <= 0 or np.any(steps % step):
+        return None
+    if (times[-1] - times[0]) // step + 1 > MAX_GRID_FILL_RATIO * times.size:
+        return None
+    return step
+
+
+def window_bounds(times, window):
+    """
+    Start (inclusive) and end (exclusive) positions of the centered time windows
+    of length `window` (nanoseconds) around each time step in `times` (int64 ns,
+    sorted). The windows are (t - window/2, t + window/2], as in pandas' centered
+    time-based rolling windows.
+    """
+    half = window // 2
+    start = np.searchsorted(times, times - half, side='right')
+    end = np.searchsorted(times, times + half, side='right')
+    return start, end
+
+
+def trailing_window_bounds(times, window):
+    """
+    Same as window_bounds, but for the trailing time windows (t - window, t],
+    which only take the time steps up to each one (as pandas' `rolling(window)`)
+    """
+    start = np.searchsorted(times, times - window, side='right')
+    return start, np.arange(1, times.size + 1)
+
+
+class _BoundsIndexer(pd.api.indexers.BaseIndexer):
+    # rolling windows of pandas with the (start, end) bounds given at creation
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None,
+                          closed=None, step=None):
+        return self.start, self.end
+
+
+def rolling(x, bounds, how):
+    """
+    Rolling sum or mean (`how`) of the valid (not NaN) values of `x` in the
+    windows `bounds`, as returned by window_bounds, with the rolling kernels of
+    pandas (with min_periods=1). The kernels add and remove the values of the
+    windows one after the other, so that their round-off depends on all the
+    previous windows, not only on the values of each window. Only these kernels
+    give the same results as pandas' `rolling(window, center=True)` on the same
+    series, to the last bit.
+    """
+    start, end = (np.ascontiguousarray(b, dtype=np.int64) for b in bounds)
+    windows = pd.Series(x, copy=False).rolling(
+        _BoundsIndexer(start=start, end=end), min_periods=1)
+    return getattr(windows, how)().to_numpy()
+
+
+def window_offsets(step, window):
+    """
+    Offsets of the first and last (both inclusive) time steps of the centered
+    time window of length `window` in a regular grid with time step `step` (ns)
+    """
+    half = window // 2
+    return (-half) // step + 1, half // step
+
+
+def _blocked_prefix_sums(x, size):
+    # prefix[p] is the sum of x from the beginning of the block of p up to p
+    # (excluded), and totals[k] is the sum of x in the k-th block
+    n = x.size
+    n_blocks = n // size + 1
+    prefix = np.zeros(n_blocks * size)
+    prefix[1:n + 1] = x
+    prefix[::size] = 0.
+    blocks = prefix.reshape(n_blocks, size)
+    np.cumsum(blocks, axis=1, out=blocks)
+    totals = blocks[:-1, -1] + x[size - 1::size]
+    return prefix, totals
+
+
+def window_sums(x, bounds):
+    """
+    Sums and number of valid (not NaN) values of `x` in each of the windows in
+    `bounds`, a list of (start, end) pairs as returned by window_bounds. The sums
+    are NaN in windows without valid values, as in pandas' rolling windows with
+    min_periods=1. All the windows share the same prefix sums.
+    """
+    valid = ~np.isnan(x)
+    count_prefix = np.zeros(x.size + 1, dtype=np.int64)
+    np.cumsum(valid, out=count_prefix[1:])
+
+    # the block size is larger than any window, so that each window spans one
+    # block or two consecutive blocks
+    size = PREFIX_BLOCK_SIZE
+    if x.size:
+        longest = max(int((end - start).max()) for start, end in bounds)
+        size = max(size, 1 << max(longest - 1, 0).bit_length())
+    prefix, totals = _blocked_prefix_sums(np.where(valid, x, 0.), size)
+
+    results = []
+    for start, end in bounds:
+        count = count_prefix[end] - count_prefix[start]
+        total = prefix[end] - prefix[start]
+        crossing = np.flatnonzero(start // size != end // size)
+        total[crossing] += totals[start[crossing] // size]
+        results.append((np.where(count > 0, total, np.nan), count))
+    return results
+
+
+def regular_window_sums(x, offsets, phase=0):
+    """
+    Same as window_sums, but for time series on a regular grid, with the windows
+    given as (first, last) offsets, as returned by window_offsets. The windows are
+    integer slices of the prefix sums, so that it runs in O(n) time. The blocks of
+    the prefix sums are shifted `phase` positions back from the start of x (see
+    multi_window_indices).
+    """
+    n = x.size
+    left = max(0, -min(first for first, _ in offsets))
+    right = max(0, max(last for _, last in offsets))
+    width = left + right + 1
+
+    valid = ~np.isnan(x)
+    count_prefix = np.zeros(n + width, dtype=np.int64)
+    np.cumsum(valid, out=count_prefix[left + 1:left + n + 1])
+    count_prefix[left + n + 1:] = count_prefix[left + n]
+
+    # blocked prefix sums: each block carries a halo with the `width` values that
+    # follow it, so that all the windows in the block lie within the same block
+    size = PREFIX_BLOCK_SIZE
+    n_blocks = -(-(n + phase) // size)
+    padded = np.zeros(n_blocks * size + width)
+    padded[left + phase:left + phase + n] = np.where(valid, x, 0.)
+    blocks = np.lib.stride_tricks.sliding_window_view(padded, size + width)[::size]
+    prefix = np.zeros((n_blocks, size + width + 1))
+    np.cumsum(blocks, axis=1, out=prefix[:, 1:])
+
+    results = []
+    for first, last in offsets:
+        lower, upper = left + first, left + last + 1
+        count = count_prefix[upper:upper + n] - count_prefix[lower:lower + n]
+        total = (prefix[:, upper:upper + size] - prefix[:, lower:lower + size]).reshape(-1)
+        total = total[phase:phase + n]
+        results.append((np.where(count > 0, total, np.nan), count))
+    return results
+
+
+def window_max(x, bounds):
+    """
+    Maximum of the valid (not NaN) values of `x` in each of the windows in
+    `bounds`, a (start, end) pair as returned by window_bounds. It is NaN in
+    windows without valid values, as in pandas' rolling windows with min_periods=1.
+
+    It uses a sparse table of maxima over power-of-two spans, so that each window
+    is the union of two (overlapping) spans. It takes O(n log w) time, with w the
+    length of the longest window.
+    """
+    start, end = bounds
+    if not x.size:
+        return np.full(start.size, np.nan)
+    width = np.maximum(end - start, 1)
+    level = np.log2(width).astype(np.int64)
+    # tables[k][p] is the max of x[p:p + 2**k]
+    tables = [x]
+    for k in range(1, int(level.max()) + 1):
+        prev, span = tables[-1], 1 << (k - 1)
+        tables.append(np.fmax(prev[:-span], prev[span:]))
+    out = np.full(start.size, np.nan)
+    for k, table in enumerate(tables):
+        in_level = np.flatnonzero((level == k) & (end > start))
+        out[in_level] = np.fmax(
+            table[start[in_level]], table[end[in_level] - (1 << k)])
+    return out
+
+
+def regular_window_max(x, offsets):
+    """
+    Same as window_max, but for time series on a regular grid, with the window
+    given as (first, last) offsets, as returned by window_offsets. It takes O(n)
+    time with the van Herk/Gil-Werman algorithm: running maxima forwards and
+    backwards in blocks as long as the window, so that each window is the tail of
+    one block and the head of the next.
+    """
+    first, last = offsets
+    n = x.size
+    width = last - first + 1
+    left = max(0, -first)
+
+    n_blocks = -(-(n + left + max(0, last)) // width)
+    padded = np.full(n_blocks * width, np.nan)
+    padded[left:left + n] = x
+    blocks = padded.reshape(n_blocks, width)
+    head = np.fmax.accumulate(blocks, axis=1).reshape(-1)
+    tail = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1)
+
+    lower = np.arange(n) + left + first
+    return np.fmax(tail[lower], head[lower + width - 1])
+
+
+def window_mean_max(times, x, window):
+    """
+    Rolling mean and max of the valid (not NaN) values of `x` in centered time
+    windows of length `window` (ns), as pandas' `rolling(window, center=True)`
+    """
+    step = grid_step(times)
+
+    if step is None:
+        bounds = window_bounds(times, window)
+        (total, count), = window_sums(x, [bounds])
+        return total / count, window_max(x, bounds)
+
+    offsets = window_offsets(step, window)
+    positions = (times - times[0]) // step
+    grid = np.full(positions[-1] + 1, np.nan)
+    grid[positions] = x
+    (total, count), = regular_window_sums(grid, [offsets])
+    return (total / count)[positions], regular_window_max(grid, offsets)[positions]
+
+
+def abs_diff(x):
+    """
+    Absolute value of the first discrete difference of `x`, with NaN in the
+    first position (as in pandas' `diff().abs()`)
+    """
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    np.abs(np.subtract(x[1:], x[:-1]), out=out[1:])
+    return out
+
+
+def multi_window_indices(times, ghi, windows, windows_f, grid=None):
+    """
+    Rolling mean of ghi and variability indices Kv and Kvf, in centered time
+    windows of each length in `windows` (mean and Kv) and `windows_f` (Kvf), in ns,
+    for all the combinations of them. The windows in `windows_f` share the
+    absolute differences of the ghi fluctuations of each window in `windows`.
+
+    By default, the rolling sums and means are those of pandas (see rolling), so
+    that they are bit-identical to the ones of pandas' `rolling(window,
+    center=True)` on the whole series.
+
+    When `times` is a chunk of a longer series on a regular grid (possibly with
+    gaps), `grid` is the (origin, step) of the grid of the whole series, in ns.
+    The windows are then integer offsets in the grid, and the sums are taken from
+    blocked prefix sums (see regular_window_sums) whose blocks are aligned with
+    those of the whole series, so that the results of any chunk are bit-identical
+    to the ones of any other chunk (away from the ends of the chunks). They only
+    differ from the ones of pandas by round-off.
+
+    Returns a dict with the (mean_ghi, Kv, Kvf) of each (window, window_f).
+    """
+    windows, windows_f = list(windows), list(windows_f)
+
+    if grid is None:
+        bounds = [window_bounds(times, window) for window in windows]
+        bounds_f = [window_bounds(times, window_f) for window_f in windows_f]
+
+        def mean(x, bound):
+            return rolling(x, bound, 'mean')
+
+        def sums(x, bounds):
+            return [rolling(x, bound, 'sum') for bound in bounds]
+
+        def to_grid(x):
+            return x
+
+        from_grid = to_grid
+
+    else:
+        origin, step = grid
+        bounds = [window_offsets(step, window) for window in windows]
+        bounds_f = [window_offsets(step, window_f) for window_f in windows_f]
+        phase = int((times[0] - origin) // step) % PREFIX_BLOCK_SIZE
+        positions = (times - times[0]) // step
+        on_grid = positions[-1] + 1 == times.size
+
+        def to_grid(x):
+            if on_grid:
+                return x
+            grid = np.full(positions[-1] + 1, np.nan)
+            grid[positions] = x
+            return grid
+
+        def from_grid(x):
+            return x if on_grid else x[positions]
+
+        def mean(x, bound):
+            (total, count), = regular_window_sums(to_grid(x), [bound], phase)
+            return from_grid(total / count)
+
+        def sums(x, bounds):
+            return [total for total, _ in regular_window_sums(x, bounds, phase)]
+
+    indices = {}
+    for window, bound in zip(windows, bounds):
+        mean_ghi = mean(ghi, bound)
+        # the differences are between consecutive time stamps, not grid nodes
+        dghi = to_grid(abs_diff(ghi - mean_ghi))
+        kv, *kvf_sums = sums(dghi, [bound] + bounds_f)
+        kv = from_grid(kv) / (window / 1e9)
+        for window_f, kvf in zip(windows_f, kvf_sums):
+            indices[window, window_f] = (mean_ghi, kv, from_grid(kvf) / (window_f / 1e9))
+    return indices
+
+
+def panel_variability_indices(times, ghi, window, window_f, grid=None):
+    """
+    Same as multi_window_indices, with one window and window_f, for each row of
+    the 2D array `ghi` (e.g., sites x time), with the time stamps `times`.
+
+    By default, the rows are laid out one after the other, each one with the
+    windows of its own time stamps, so that all the rows take the same calls to
+    the rolling kernels of pandas (see rolling). The windows of consecutive rows
+    do not overlap, and the kernels start anew at each row, so that the results
+    are bit-identical to those of each row on its own.
+
+    When `times` is a chunk of a longer series on a regular grid, `grid` is the
+    (origin, step) of the grid of the whole series, as in multi_window_indices.
+    The rows are then laid out in a single grid, with a stride that is a multiple
+    of PREFIX_BLOCK_SIZE and leaves enough empty nodes between rows for their
+    windows not to overlap, so that all the rows take the same passes of blocked
+    prefix sums, aligned with those of the whole series.
+
+    Returns the 2D arrays of the rolling mean of ghi, Kv and Kvf.
+    """
+    n_rows, n_times = ghi.shape
+
+    if grid is None:
+        shift = n_times * np.arange(n_rows)[:, None]
+
+        def panel_bounds(window):
+            return [(bound + shift).reshape(-1) for bound in window_bounds(times, window)]
+
+        bounds = panel_bounds(window)
+        ghi = ghi.reshape(-1)
+        mean_ghi = rolling(ghi, bounds, 'mean')
+        # the differences are between consecutive time stamps of each row
+        dghi = abs_diff(ghi - mean_ghi)
+        dghi[::n_times] = np.nan
+        kv = rolling(dghi, bounds, 'sum') / (window / 1e9)
+        kvf = rolling(dghi, panel_bounds(window_f), 'sum') / (window_f / 1e9)
+        return tuple(x.reshape(n_rows, n_times) for x in (mean_ghi, kv, kvf))
+
+    origin, step = grid
+    offsets = window_offsets(step, window)
+    offsets_f = window_offsets(step, window_f)
+    left = max(0, -offsets[0], -offsets_f[0])
+    right = max(0, offsets[1], offsets_f[1])
+    phase = int((times[0] - origin) // step) % PREFIX_BLOCK_SIZE
+    positions = (times - times[0]) // step
+    size = PREFIX_BLOCK_SIZE
+    stride = -(-(positions[-1] + 1 + left + right) // size) * size
+
+    def to_grid(x):
+        grid = np.full((n_rows, stride), np.nan)
+        grid[:, positions] = x
+        return grid.reshape(-1)
+
+    def from_grid(x):
+        return x.reshape(n_rows, stride)[:, positions]
+
+    (total, count), = regular_window_sums(to_grid(ghi), [offsets], phase)
+    mean_ghi = from_grid(total / count)
+    # the differences are between consecutive time stamps of each row
+    fluctuation = ghi - mean_ghi
+    dghi = np.empty_like(fluctuation)
+    dghi[:, :1] = np.nan
+    np.abs(np.subtract(fluctuation[:, 1:], fluctuation[:, :-1]), out=dghi[:, 1:])
+    (kv, _), (kvf, _) = regular_window_sums(to_grid(dghi), [offsets, offsets_f], phase)
+    return mean_ghi, from_grid(kv) / (window / 1e9), from_grid(kvf) / (window_f / 1e9)
+
+
+def trailing_variability_indices(times, ghi, window, window_f):
+    """
+    Same as multi_window_indices, with one window and window_f, but in trailing
+    time windows (see trailing_window_bounds). The indices of each time step only
+    depend on the past data, up to two windows before it
+    """
+    bounds = trailing_window_bounds(times, window)
+    bounds_f = trailing_window_bounds(times, window_f)
+    (total, count), = window_sums(ghi, [bounds])
+    mean_ghi = total / count
+    dghi = abs_diff(ghi - mean_ghi)
+    (kv, _), (kvf, _) = window_sums(dghi, [bounds, bounds_f])
+    return mean_ghi, kv / (window / 1e9), kvf / (window_f / 1e9)
@@ -0,0 +1,156 @@
+import numpy as np
+
+from loguru import logger
+
+from . import kernels
+from .classifier import (
+    REQUIRED, _classify_array, _clean, _ghi_mirroring, _prepare, _threshold, true_solar_time)
+from .config import resolve_config
+from .skytype import SkyType
+
+
+logger.disable(__name__)
+
+
+# max. number of values (sites x time steps) classified at once
+MAX_BATCH_VALUES = 2**20
+
+# max. number of values (sites x time steps) in each ghi mirroring
+MAX_MIRRORING_VALUES = 2**14
+
+
+def classify_panel(times, sza, eth, ghi, ghics, ghicda, longitude=None,
+                   enable_ghi_mirroring=True, cleaning_pipeline=None, config=None):
+    """
+    Classifies the time series of many sites on the same time grid (a panel) at
+    once, without the overhead of one call of `classify` per site.
+
+    The sites are classified in batches, with the ghi mirroring, the variability
+    indices, the thresholds and the cleaning filters vectorized along the site
+    axis (see kernels.panel_variability_indices). The sky types are the same as
+    those of `classify` on each site.
+
+    Parameters:
+    -----------
+
+    times: array of datetime64 (or int64 nanoseconds since epoch)
+      the UTC time stamps shared by all the sites, sorted in increasing order
+
+    sza, eth, ghi, ghics, ghicda: 2D float arrays
+      the input variables, as in `classify`, with one row per site and one column
+      per time stamp
+
+    longitude: float array
+      the longitude of each site, in degrees. Only required for the ghi mirroring
+
+    enable_ghi_mirroring, cleaning_pipeline, config:
+      as in `classify`
+
+    Returns:
+    --------
+
+    A uint8 array (sites x time) with the sky type labels.
+    """
+    return _classify_panel(
+        times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring,
+        cleaning_pipeline, config, unit=kernels.time_unit(times)
+    )
+
+
+def _classify_panel(times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring,
+                    cleaning_pipeline, config, grid=None, unit=1):
+    # classify_panel, with the indices of a chunk of a longer series on the regular
+    # grid `grid`, if given (see kernels.panel_variability_indices), and the `unit`
+    # of the time stamps as given (see classifier._ghi_mirroring)
+    config = resolve_config(config)
+    times, sza, eth, ghi, ghics, ghicda, longitude, _ = _prepare(
+        times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring)
+    for name, x in zip(REQUIRED, (sza, eth, ghi, ghics, ghicda)):
+        if np.shape(x) != (np.shape(ghi)[0], times.size) or np.ndim(x) != 2:
+            raise ValueError(f'{name} must be a (sites x time) array with a column '
+                             'per time stamp')
+
+    n_sites = ghi.shape[0]
+    if enable_ghi_mirroring is True:
+        longitude = np.broadcast_to(longitude, (n_sites,))
+
+    sky_type = np.empty((n_sites, times.size), dtype=np.uint8)
+    if not sky_type.size:
+        return sky_type
+
+    batch_size = max(1, MAX_BATCH_VALUES // times.size)
+    for first in range(0, n_sites, batch_size):
+        rows = slice(first, first + batch_size)
+        logger.debug(f'sites {first} to {min(first + batch_size, n_sites) - 1}')
+        sky_type[rows] = _classify_rows(
+            times, sza[rows], ghi[rows], ghics[rows], ghicda[rows],
+            longitude[rows] if enable_ghi_mirroring is True else None,
+            enable_ghi_mirroring, cleaning_pipeline, config, unit, grid
+        )
+    return sky_type
+
+
+def _classify_rows(times, sza, ghi, ghics, ghicda, longitude, enable_ghi_mirroring,
+                   cleaning_pipeline, config, unit=1, grid=None):
+    # classifies a batch of sites (rows), as classifier._classify_array
+    n_rows, n_times = ghi.shape
+
+    step = kernels.grid_step(times)
+    if step is None:
+        logger.warning('the time stamps are not on a regular grid: the sites are '
+                       'classified one by one')
+        return np.array([
+            _classify_array(
+                times, sza[row], None, ghi[row], ghics[row], ghicda[row],
+                longitude[row] if enable_ghi_mirroring is True else None,
+                enable_ghi_mirroring, False, cleaning_pipeline, config, unit=unit
+            )
+            for row in range(n_rows)
+        ])
+
+    daytime = sza <= config.max_sza
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+
+        ghi_ = ghi
+        if enable_ghi_mirroring is True:
+            # the equation of time is shared by all the sites, and the days of
+            # a few sites at a time are mirrored together (the sorts in the
+            # mirroring get slower than a loop over sites in larger groups)
+            tst = true_solar_time(times, longitude[:, None])
+            ghi_ = np.empty_like(ghi)
+            group_size = max(1, MAX_MIRRORING_VALUES // n_times)
+            for first in range(0, n_rows, group_size):
+                rows = slice(first, first + group_size)
+                n_group = tst[rows].shape[0]
+                ghi_[rows] = _ghi_mirroring(
+                    np.tile(times, n_group), sza[rows].reshape(-1),
+                    ghi[rows].reshape(-1), None,
+                    np.repeat(np.arange(n_group), n_times), tst[rows].reshape(-1), unit
+                ).reshape(n_group, n_times)
+
+        mean_ghi, Kv, Kvf = kernels.panel_variability_indices(
+            times, ghi_, config.window, config.window_f, grid)
+        Km = np.where(daytime, mean_ghi / ghicda, np.nan).clip(0.)
+
+    sky_type = _threshold(sza, ghi, ghics, Km, Kv, Kvf, config)
+
+    # the cleaning filters run on all the rows one after the other, with a time
+    # step of unknown sky type between rows and the time stamps of each row shifted
+    # away from the previous one by more than a window, so that the rows are
+    # cleaned independently of each other
+    positions = np.r_[(times - times[0]) // step, (times[-1] - times[0]) // step + 1]
+    stride = positions[-1] + 1 + config.window // step + 1
+    shifted_times = times[0] + step * (
+        stride * np.arange(n_rows)[:, None] + positions).reshape(-1)
+
+    def separated(x, value=np.nan):
+        return np.concatenate([x, np.full((n_rows, 1), value, dtype=x.dtype)],
+                              axis=1).reshape(-1)
+
+    sky_type = _clean(
+        separated(sky_type, SkyType.UNKNOWN), shifted_times, separated(sza),
+        separated(ghi), separated(Km), separated(Kv), separated(Kvf),
+        cleaning_pipeline, config
+    )
+    return sky_type.reshape(n_rows, n_times + 1)[:, :n_times]
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from . import chunking, classifier, kernels
+from .config import resolve_config
+
+
+logger.disable(__name__)
+
+
+def is_dask_dataframe(data):
+    """
+    Whether `data` is a dask DataFrame (without importing dask)
+    """
+    return type(data).__module__.split('.')[0] == 'dask' and hasattr(data, 'map_overlap')
+
+
+def classify_partitions(data, enable_ghi_mirroring=True, full_output=False,
+                        cleaning_pipeline=None, config=None, compact=False):
+    """
+    Lazy version of `classify` for a dask DataFrame (e.g., a partitioned Parquet
+    archive read with dask.dataframe.read_parquet), whose partitions are
+    classified independently of each other by the dask scheduler.
+
+    Each partition is classified with a halo of the neighbouring partitions (with
+    dask's map_overlap) that covers two true solar days and the rolling windows,
+    rounded up to blocks of prefix sums of the whole series (see
+    chunking.overlap_reach). The partitions shorter than the halo are merged
+    (repartitioning the DataFrame), and the sky types are the same whatever the
+    partitions, as long as the time series has night time every day (the cleaning
+    filters do not go across nights). They are those of `classify` on the whole
+    series in memory but for the ties at the thresholds (see `classify`).
+
+    The index must be sorted, with known divisions, and its time stamps on a
+    regular grid (possibly with gaps), whose time step is taken from the first
+    partition.
+
+    Returns a dask Series `sky_type` or, if `full_output` is True, a dask
+    DataFrame, as in `classify` (with the classifier.COMPACT_DTYPES, if `compact`
+    is True).
+    """
+    config = resolve_config(config)
+    if not data.known_divisions:
+        raise ValueError('the dask DataFrame must have known divisions (e.g., set '
+                         'its time index with `sorted=True`)')
+
+    origin = pd.Timestamp(data.divisions[0]).value
+    step = kernels.grid_step(kernels.as_epoch_ns(data.partitions[0].index.compute().values))
+    if step is None:
+        raise ValueError('the time stamps of the first partition are not on a '
+                         'regular grid')
+
+    reach = chunking.overlap_reach(step, config)
+    divisions = _divisions(data.divisions, reach)
+    if divisions != tuple(data.divisions):
+        logger.info(f'repartitioning in {len(divisions) - 1} partitions longer than '
+                    'the halo')
+        data = data.repartition(divisions=list(divisions))
+
+    dtypes = classifier.COMPACT_DTYPES if compact is True else \
+        {'sky_type': np.int64, 'Km': np.float64, 'Kv': np.float64, 'Kvf': np.float64}
+    if full_output is True:
+        meta = pd.DataFrame({
+            name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()})
+    else:
+        meta = pd.Series(dtype=dtypes['sky_type'], name='sky_type')
+
+    halo = pd.Timedelta(reach, 'ns')
+    return data.map_overlap(
+        _classify_partition, halo, halo, meta=meta, grid=(origin, step),
+        enable_ghi_mirroring=enable_ghi_mirroring, full_output=full_output,
+        cleaning_pipeline=cleaning_pipeline, config=config, compact=compact
+    )
+
+
+def _divisions(divisions, reach):
+    # divisions with all the partitions (but the last one) at least `reach` long,
+    # and the last one longer than `reach` or merged with the previous one
+    values = [pd.Timestamp(division).value for division in divisions]
+    if all(b - a >= reach for a, b in zip(values[:-1], values[1:])):
+        return tuple(divisions)
+
+    merged = [divisions[0]]
+    last = values[0]
+    for division, value in zip(divisions[1:-1], values[1:-1]):
+        if value - last >= reach:
+            merged.append(division)
+            last = value
+    if values[-1] - last < reach and len(merged) > 1:
+        merged.pop()
+    return tuple(merged + [divisions[-1]])
+
+
+def _classify_partition(data, grid, enable_ghi_mirroring, full_output,
+                        cleaning_pipeline, config, compact):
+    # classifies a partition with its halo, on the grid of the whole series
+    if data.empty:
+        result = {
+            'sky_type': np.zeros(0, dtype=np.int64),
+            **{name: np.zeros(0) for name in ('Km', 'Kv', 'Kvf')}
+        }
+        return _output(data, result if full_output is True else result['sky_type'],
+                       full_output, compact)
+
+    origin, step = grid
+    times = kernels.as_epoch_ns(data.index.values)
+    if np.any((times - origin) % step):
+        raise ValueError('the time stamps are not on the regular grid of the first '
+                         'partition')
+
+    longitude = data['longitude'].to_numpy(dtype=np.float64) \
+        if enable_ghi_mirroring is True else None
+    result = classifier._classify_array(
+        times, *[data[name].to_numpy(dtype=np.float64) for name in classifier.REQUIRED],
+        longitude, enable_ghi_mirroring, full_output, cleaning_pipeline, config, grid,
+        kernels.time_unit(data.index.values)
+    )
+    return _output(data, result, full_output, compact)
+
+
+def _output(data, result, full_output, compact):
+    # the Series (or DataFrame) of a partition, from the result of _classify_array
+    if compact is True:
+        result = classifier._compact(result)
+    if full_output is True:
+        return pd.DataFrame(index=data.index, data=result)
+    return pd.Series(index=data.index, data=result, name='sky_type')
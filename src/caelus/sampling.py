@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from . import kernels
+
+
+logger.disable(__name__)
+
+# time step of the grid of the classification: the windows and thresholds of the
+# classification are meant for 1-min data
+STEP = pd.Timedelta(1, 'min').value
+
+# min. fraction of the expected samples of a time step of the grid (its length
+# over the sampling interval) that must be valid for its mean to be valid
+MIN_COVERAGE = 0.5
+
+
+def sampling_interval(times):
+    """
+    Sampling interval (ns) of the time stamps `times` (datetime64 values or int64
+    nanoseconds since epoch, sorted in increasing order): the most frequent time
+    difference between consecutive (and different) time stamps, so that it is not
+    changed by data gaps, duplicate time stamps or a few irregular ones. None if
+    there are less than two different time stamps
+    """
+    times = kernels.as_epoch_ns(times)
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    if steps.size == 0:
+        return None
+    values, counts = np.unique(steps, return_counts=True)
+    return int(values[np.argmax(counts)])
+
+
+def regularize(data, step=STEP, min_coverage=MIN_COVERAGE, label='left'):
+    """
+    Pandas DataFrame `data` on the regular grid with time step `step`, which
+    `classify` runs on with its integer-window kernels (see kernels.grid_step).
+
+    The time stamps of data are sorted, and only the first of the duplicate time
+    stamps is kept. Then, the values are averaged in blocks of one time step of
+    the grid, aligned to whole multiples of `step` since epoch (i.e., whole
+    minutes), and the time steps whose block has no data, or less valid (not
+    NaN) values than `min_coverage` times the expected ones (step over the
+    sampling interval, see sampling_interval), are NaN. Data at (or coarser than)
+    the time step of the grid are moved to the grid, with NaN in the gaps, but
+    for those whose time stamps are all whole multiples of `step` apart (e.g.,
+    1-min data at the 30th second, possibly with gaps), which keep their own
+    grid phase and values.
+
+    data: Pandas DataFrame
+      the time series, with a DatetimeIndex in UTC. Only its numeric columns are
+      kept (as float64)
+
+    step: int or str or Pandas Timedelta
+      the time step of the grid, in ns or as anything that pandas.Timedelta
+      takes. By default, 1 min
+
+    min_coverage: float
+      min. fraction of valid values in each time step of the grid
+
+    label: str
+      'left' to average the data in [t, t + step) at the time step t of the grid
+      (as pandas' resample, by default), or 'right' to average those in
+      (t - step, t] (e.g., for data labeled at the end of their sampling period)
+
+    Returns a new Pandas DataFrame.
+    """
+    if label not in ('left', 'right'):
+        raise ValueError(f'unknown label {label!r}: expected \'left\' or \'right\'')
+    step = pd.Timedelta(step).value
+    if step <= 0:
+        raise ValueError('the time step of the grid must be positive')
+
+    data = data.select_dtypes(include='number')
+    times = kernels.as_epoch_ns(data.index.values)
+    columns = [data[name].to_numpy(dtype=np.float64) for name in data.columns]
+
+    if times.size == 0:
+        return pd.DataFrame(index=data.index[:0], data={
+            name: np.zeros(0) for name in data.columns})
+
+    # sorted time stamps, without duplicates
+    order = None
+    if not (times[1:] >= times[:-1]).all():
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+    if not (unique := np.r_[True, times[1:] != times[:-1]]).all():
+        order = np.flatnonzero(unique) if order is None else order[unique]
+        times = times[unique]
+
+    interval = sampling_interval(times) or step
+    if interval > step:
+        logger.warning(f'the sampling interval ({pd.Timedelta(interval)}) is longer '
+                       f'than the time step of the grid ({pd.Timedelta(step)})')
+    min_count = max(1, int(np.ceil(min_coverage * step / interval - 1e-9)))
+
+    # data on a grid of time step `step` (or a multiple of it) keep their phase
+    phase = times[0] % step
+    if np.any((times - phase) % step):
+        phase = 0
+
+    # time step of the grid of each time stamp, and first time stamp of each one
+    position = (times - phase) // step if label == 'left' else -(-(times - phase) // step)
+    first = position[0]
+    position -= first
+    starts = np.flatnonzero(np.r_[True, position[1:] != position[:-1]])
+    filled = position[starts]
+    n_steps = int(position[-1]) + 1
+    sizes = np.diff(starts, append=times.size)
+
+    result = {}
+    for name, values in zip(data.columns, columns):
+        if order is not None:
+            values = values[order]
+        if (nan := np.isnan(values)).any():
+            # the NaN are neither added nor counted
+            sums = np.add.reduceat(np.where(nan, 0., values), starts)
+            counts = sizes - np.add.reduceat(nan, starts, dtype=np.int64)
+        else:
+            sums = np.add.reduceat(values, starts)
+            counts = sizes
+        means = np.full(n_steps, np.nan)
+        means[filled] = np.where(counts >= min_count, sums / np.maximum(counts, 1), np.nan)
+        result[name] = means
+
+    index = pd.DatetimeIndex(
+        phase + (first + np.arange(n_steps)) * step, name=data.index.name, tz=data.index.tz)
+    logger.info(f'{len(data)} time stamps (sampling interval, {pd.Timedelta(interval)}) '
+                f'averaged in {n_steps} time steps of {pd.Timedelta(step)}')
+    return pd.DataFrame(index=index, data=result)
@@ -0,0 +1,182 @@
+import numpy as np
+
+
+# value of the sky type and length of the neighbours of the first and last segments
+NO_SEGMENT = 0
+
+
+class SegmentTable:
+    """
+    Run-length encoding of a sky type time series.
+
+    Each segment (or sky patch) is a run of consecutive time steps with the same
+    sky type. For instance, the sequence of sky types:
+
+        [2, 2, 2, 4, 4, 5, 5, 5, 5, 5, 3, 4, 4]
+
+    is encoded as:
+
+        segment  start  length  sky_type  prev_sky_type  prev_length  next_sky_type  next_length
+        0            0       3         2              0            0              4            2
+        1            3       2         4              2            3              5            5
+        2            5       5         5              4            2              3            1
+        3           10       1         3              5            5              4            2
+        4           11       2         4              3            1              0            0
+
+    The first and last segments have no previous and next neighbours,
+    respectively, which is signaled with NO_SEGMENT in their sky type and length.
+    """
+
+    def __init__(self, start, length, sky_type):
+        self.start = start
+        self.length = length
+        self.sky_type = sky_type
+
+    @classmethod
+    def from_sky_type(cls, sky_type):
+        """
+        Builds the segment table of the sky type series `sky_type` (int array)
+        """
+        sky_type = np.asarray(sky_type)
+        start = np.flatnonzero(np.concatenate([[True], sky_type[1:] != sky_type[:-1]]))
+        if not sky_type.size:
+            start = start[:0]
+        length = np.diff(start, append=sky_type.size)
+        return cls(start, length, sky_type[start])
+
+    def __len__(self):
+        return self.start.size
+
+    @property
+    def n_times(self):
+        """Number of time steps in the sky type series"""
+        return int(self.length.sum())
+
+    @property
+    def end(self):
+        """Position of the time step after the last one in each segment"""
+        return self.start + self.length
+
+    @property
+    def prev_sky_type(self):
+        return np.concatenate([[NO_SEGMENT], self.sky_type[:-1]]).astype(self.sky_type.dtype)
+
+    @property
+    def next_sky_type(self):
+        return np.concatenate([self.sky_type[1:], [NO_SEGMENT]]).astype(self.sky_type.dtype)
+
+    @property
+    def prev_length(self):
+        return np.concatenate([[NO_SEGMENT], self.length[:-1]])
+
+    @property
+    def next_length(self):
+        return np.concatenate([self.length[1:], [NO_SEGMENT]])
+
+    def to_sky_type(self):
+        """Sky type of each time step"""
+        return np.repeat(self.sky_type, self.length)
+
+    def relabel(self, sky_type):
+        """
+        New segment table with the sky types `sky_type` for each segment, in which
+        consecutive segments that end up with the same sky type are merged
+        """
+        first = np.flatnonzero(np.r_[True, sky_type[1:] != sky_type[:-1]])
+        if not len(self):
+            first = first[:0]
+        return SegmentTable(
+            self.start[first], np.add.reduceat(self.length, first), sky_type[first])
+
+    def patch(self, segments, sky_type):
+        """
+        New segment table in which the segments with indices `segments` (sorted)
+        take the sky types `sky_type` at each of their time steps (concatenated, in
+        the order of `segments`). The rest of the segments remain as they are, and
+        consecutive segments that end up with the same sky type are merged
+        """
+        segments = np.asarray(segments)
+        if not segments.size:
+            return self
+        positions, group = self.positions(segments)
+        first = np.r_[True, (sky_type[1:] != sky_type[:-1]) | (group[1:] != group[:-1])]
+        keep = np.ones(len(self), dtype=bool)
+        keep[segments] = False
+        start = np.r_[self.start[keep], positions[first]]
+        order = np.argsort(start, kind='stable')
+        start = start[order]
+        sky_type = np.r_[self.sky_type[keep], sky_type[first]][order].astype(self.sky_type.dtype)
+        length = np.diff(np.r_[start, self.n_times])
+        return SegmentTable(start, length, sky_type).relabel(sky_type)
+
+    def positions(self, segments=None):
+        """
+        Positions of the time steps in all the segments (or in the segments with
+        indices `segments`, in that order), and the segment of each position
+        """
+        segments = np.arange(len(self)) if segments is None else np.asarray(segments)
+        length = self.length[segments]
+        first = np.cumsum(length) - length
+        group = np.repeat(np.arange(segments.size), length)
+        positions = np.arange(group.size) - first[group] + self.start[segments][group]
+        return positions, group
+
+    def mean(self, x, segments=None):
+        """
+        Mean of the valid (not NaN) values of `x` in each segment (or in the
+        segments with indices `segments`). It is NaN for segments without valid values
+        """
+        x, group, n_groups = self._valid_values(x, segments)
+        count = np.bincount(group, minlength=n_groups)
+        total = np.bincount(group, weights=x, minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+
+    def max(self, x, segments=None):
+        """
+        Maximum of the valid (not NaN) values of `x` in each segment (or in the
+        segments with indices `segments`). It is NaN for segments without valid values
+        """
+        segments = np.arange(len(self)) if segments is None else np.asarray(segments)
+        if not segments.size:
+            return np.zeros(0)
+        positions, _ = self.positions(segments)
+        length = self.length[segments]
+        x = np.asarray(x, dtype=np.float64)[positions]
+        # the segments are contiguous in x, and fmax ignores NaNs
+        return np.fmax.reduceat(x, np.cumsum(length) - length)
+
+    def quantile(self, x, q, segments=None):
+        """
+        q-th quantile of the valid (not NaN) values of `x` in each segment (or in
+        the segments with indices `segments`), with the linear interpolation of
+        numpy.quantile (and pandas). It is NaN for segments without valid values.
+
+        All the segments are sorted at once, by segment and value, so that the
+        quantiles are just lookups in the sorted values.
+        """
+        x, group, n_groups = self._valid_values(x, segments)
+        x = x[np.lexsort((x, group))]
+        count = np.bincount(group, minlength=n_groups)
+        first = np.cumsum(count) - count
+
+        out = np.full(n_groups, np.nan)
+        valid = count > 0
+        index = (count[valid] - 1) * q
+        below = np.floor(index)
+        gamma = index - below
+        below = first[valid] + below.astype(np.int64)
+        above = np.minimum(below + 1, first[valid] + count[valid] - 1)
+        a, b = x[below], x[above]
+        # same interpolation (and round-off) as numpy's linear method
+        diff = b - a
+        out[valid] = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+        return out
+
+    def _valid_values(self, x, segments):
+        # valid values of x in the segments, their segment and the number of segments
+        positions, group = self.positions(segments)
+        x = np.asarray(x, dtype=np.float64)[positions]
+        valid = ~np.isnan(x)
+        n_groups = len(self) if segments is None else np.size(segments)
+        return x[valid], group[valid], n_groups
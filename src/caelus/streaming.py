@@ -0,0 +1,486 @@
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from . import chunking, kernels
+from .config import resolve_config
+from .classifier import REQUIRED, _check_variables, _classify_array, _threshold
+from .skytype import SkyType
+
+
+logger.disable(__name__)
+
+
+def iter_classify(chunks, enable_ghi_mirroring=True, full_output=False,
+                  cleaning_pipeline=None, config=None):
+    """
+    Classifies a time series that comes in chunks, with bounded memory.
+
+    Only the trailing part of the series that is needed to classify the
+    forthcoming data is kept between chunks: a halo of a few days for the rolling
+    windows and the cleaning filters (see chunking.halo_start). Hence, the peak
+    memory is set by the length of the chunks (plus the halo), regardless of the
+    length of the whole series.
+
+    The sky types are only final when enough data after them is known. Thus, the
+    labels yielded after each chunk are those that became final with it, which
+    usually lag the chunk until the last night time in it. The remaining labels are
+    yielded at the end. All together, they are the same whatever the chunks, as
+    long as the time stamps lie on a regular grid (e.g., 1-min data, possibly with
+    gaps) with the time step of the first chunk. They are those of `classify` on
+    the whole series but for the ties at the thresholds (see `classify`).
+
+    chunks: iterable of Pandas DataFrames
+      the chunks of the time series, in time order, with the same columns required
+      by `classify`
+
+    enable_ghi_mirroring, full_output, cleaning_pipeline, config:
+      as in `classify`
+
+    Yields Pandas Series (or DataFrames, if `full_output` is True), one after each
+    chunk (possibly empty) and a last one with the remaining labels.
+    """
+    config = resolve_config(config)
+    names = REQUIRED + (['longitude'] if enable_ghi_mirroring is True else [])
+
+    buffer = None  # index and variables of the time steps kept from previous chunks
+    grid = None
+    classified = 0  # number of time steps of the buffer that are already yielded
+
+    for data in chunks:
+        _check_variables(data.columns, enable_ghi_mirroring)
+
+        chunk = {'index': data.index, 'times': kernels.as_epoch_ns(data.index.values)}
+        chunk.update({name: data[name].to_numpy(dtype=np.float64) for name in names})
+
+        if buffer is None:
+            buffer = chunk
+            unit = kernels.time_unit(data.index.values)
+        else:
+            if chunk['times'].size and buffer['times'].size and \
+                    chunk['times'][0] <= buffer['times'][-1]:
+                raise ValueError('the chunks must be in increasing time order')
+            buffer = {
+                name: buffer[name].append(values) if name == 'index'
+                else np.concatenate([buffer[name], values])
+                for name, values in chunk.items()
+            }
+
+        times = buffer['times']
+        if grid is None:
+            step = kernels.grid_step(times)
+            if step is None:
+                if times.size < 2:
+                    yield _empty_result(full_output)
+                    continue
+                raise ValueError('the time stamps are not on a regular grid')
+            grid = (int(times[0]), step)
+        elif np.any((times - grid[0]) % grid[1]):
+            raise ValueError('the time stamps are off the regular grid of the first chunk')
+
+        # the labels are final up to the last night time step that has its whole
+        # halo of forthcoming data in the buffer
+        step = grid[1]
+        reach = chunking.halo_reach(step, enable_ghi_mirroring, config)
+        longitude = buffer['longitude'] if enable_ghi_mirroring is True else None
+        night = np.flatnonzero(~(buffer['sza'] <= config.max_sza))
+        night = night[(night > classified) & (times[night - 1] + reach < times[-1])]
+        if not night.size:
+            yield _empty_result(full_output)
+            continue
+        end = night[-1]
+
+        yield _classify_buffer(
+            buffer, classified, end, grid, enable_ghi_mirroring, full_output,
+            cleaning_pipeline, config, unit
+        )
+
+        # keep only the halo of the next chunk
+        lo = chunking.halo_start(
+            times, grid, end, longitude, enable_ghi_mirroring, config)
+        buffer = {
+            name: values[lo:] for name, values in buffer.items()
+        }
+        classified = end - lo
+        logger.debug(f'{buffer["times"].size} time steps kept in the buffer')
+
+    if buffer is None:
+        return
+
+    # the remaining labels (without grid, the buffer has the whole series)
+    yield _classify_buffer(
+        buffer, classified, buffer['times'].size, grid, enable_ghi_mirroring,
+        full_output, cleaning_pipeline, config, unit
+    )
+
+
+def _classify_buffer(buffer, start, end, grid, enable_ghi_mirroring, full_output,
+                     cleaning_pipeline, config, unit=1):
+    # classifies the whole buffer and returns the results of time steps [start, end)
+    result = _classify_array(
+        buffer['times'], *[buffer[name] for name in REQUIRED],
+        buffer.get('longitude'), enable_ghi_mirroring, full_output, cleaning_pipeline,
+        config, grid, unit
+    )
+    index = buffer['index'][start:end] if 'index' in buffer \
+        else pd.DatetimeIndex(buffer['times'][start:end])
+    if full_output is True:
+        return pd.DataFrame(
+            index=index, data={name: values[start:end] for name, values in result.items()})
+    return pd.Series(index=index, data=result[start:end], name='sky_type')
+
+
+def _events(times=(), sky_type=(), n_provisional=0):
+    # events of ProvisionalClassifier: the first `n_provisional` are provisional
+    # sky types, and the rest are revisions of final sky types
+    revision = np.ones(len(sky_type), dtype=bool)
+    revision[:n_provisional] = False
+    return pd.DataFrame(
+        index=pd.DatetimeIndex(np.asarray(times, dtype='datetime64[ns]')),
+        data={'sky_type': np.asarray(sky_type, dtype=np.int64), 'revision': revision}
+    )
+
+
+def _empty_result(full_output):
+    index = pd.DatetimeIndex([])
+    if full_output is True:
+        return pd.DataFrame(index=index, data={
+            'sky_type': np.zeros(0, dtype=np.int64),
+            **{name: np.zeros(0) for name in ('Km', 'Kv', 'Kvf')}
+        })
+    return pd.Series(index=index, data=np.zeros(0, dtype=np.int64), name='sky_type')
+
+
+class StreamingClassifier:
+    """
+    Online classification of a real-time feed of (1-min) records.
+
+    The records are pushed as they arrive, one by one or in small batches, and
+    the classifier returns the sky types that become final with them. A sky type
+    is final when the data after it can no longer change it: the rolling windows,
+    the ghi mirroring of its true solar day and the cleaning filters, which
+    can propagate changes until the next night. Thus, the sky types of each day
+    become final shortly after the following true solar midnight (see
+    FINALIZATION_DELAY). They are the same as those of iter_classify, as long as
+    the time stamps lie on a regular grid with the time step of the first
+    records, and hence those of `classify` on the whole series but for the ties
+    at the thresholds (see `classify`).
+
+    The records are kept in sliding buffers with the halo of a few days required
+    to classify the forthcoming data (see chunking.halo_start), and the pending
+    records are classified all at once when they become final. Hence, the memory
+    is bounded and the amortized time per record is constant.
+
+    enable_ghi_mirroring, full_output, cleaning_pipeline, config:
+      as in `classify`. The config (by default, the current options) is taken at
+      the creation of the classifier
+
+    Usage:
+
+        classifier = StreamingClassifier()
+        for records in feed:  # DataFrames with the columns required by classify
+            sky_type = classifier.push(records)
+            ...
+        sky_type = classifier.flush()
+    """
+
+    # time after the first record of a new true solar day (or UTC day, without
+    # ghi mirroring) when the records of the previous day are classified. It
+    # gives room to the jumps of the equation of time at the turn of the year
+    FINALIZATION_DELAY = pd.Timedelta(1, 'h').value
+
+    def __init__(self, enable_ghi_mirroring=True, full_output=False,
+                 cleaning_pipeline=None, config=None):
+        self.enable_ghi_mirroring = enable_ghi_mirroring
+        self.full_output = full_output
+        self.cleaning_pipeline = cleaning_pipeline
+        self.config = resolve_config(config)
+        self.names = REQUIRED + (['longitude'] if enable_ghi_mirroring is True else [])
+        self._reset()
+
+    def _reset(self):
+        self._buffer = _SlidingBuffer(['times'] + self.names)
+        self._grid = None
+        self._unit = None  # unit of the time stamps of the first records
+        self._classified = 0  # number of time steps of the buffer already returned
+        self._day = None  # last day whose previous days are classified
+        self._finalization = None  # time stamp when the next classification is due
+
+    def push(self, data):
+        """
+        Appends the records in `data` (a Pandas DataFrame with the columns
+        required by `classify`, in time order) and returns the sky types that
+        become final, as a Pandas Series (or DataFrame, with full_output) indexed
+        by the UTC time stamps, which may be empty
+        """
+        self._append(data)
+        result = self._finalize_due() if self._grid is not None else None
+        return _empty_result(self.full_output) if result is None else result
+
+    def _append(self, data):
+        # appends the records to the buffer, and returns their number
+        _check_variables(data.columns, self.enable_ghi_mirroring)
+
+        times = kernels.as_epoch_ns(data.index.values)
+        if not times.size:
+            return 0
+
+        buffer = self._buffer
+        if len(buffer) and times[0] <= buffer['times'][-1]:
+            raise ValueError('the records must be in increasing time order')
+        if self._unit is None:
+            self._unit = kernels.time_unit(data.index.values)
+        if self._grid is not None and np.any((times - self._grid[0]) % self._grid[1]):
+            raise ValueError('the time stamps are off the regular grid of the first records')
+
+        buffer.append(
+            {'times': times,
+             **{name: data[name].to_numpy(dtype=np.float64) for name in self.names}}
+        )
+
+        if self._grid is None:
+            step = kernels.grid_step(buffer['times'])
+            if step is None:
+                if len(buffer) > 1:
+                    raise ValueError('the time stamps are not on a regular grid')
+                return times.size
+            self._grid = (int(buffer['times'][0]), step)
+        return times.size
+
+    def _finalize_due(self):
+        # the records of the previous days are classified a while after the first
+        # record of a new day. Returns None if it is not due yet
+        buffer = self._buffer
+        last = len(buffer) - 1
+        day = self._days(np.array([last]))[0]
+        if self._day is None:
+            self._day = day
+        if day > self._day and self._finalization is None:
+            days = self._days(np.arange(self._classified, len(buffer)))
+            first = self._classified + np.flatnonzero(days >= day)[0]
+            self._finalization = (buffer['times'][first], day)
+        if self._finalization is None:
+            return None
+        day_start, day = self._finalization
+        if buffer['times'][last] < day_start + self.FINALIZATION_DELAY:
+            return None
+        self._finalization = None
+        self._day = day
+        return self._finalize(day_start)
+
+    def flush(self):
+        """
+        Returns the sky types of all the records that are not final yet, as if the
+        time series ended with the last record, and resets the classifier
+        """
+        buffer = self._buffer
+        result = _classify_buffer(
+            buffer.head(len(buffer)), self._classified, len(buffer), self._grid,
+            self.enable_ghi_mirroring, self.full_output, self.cleaning_pipeline, self.config,
+            self._unit
+        ) if len(buffer) else _empty_result(self.full_output)
+        self._reset()
+        return result
+
+    def _days(self, index):
+        # true solar day (or UTC day, without ghi mirroring) of the time steps `index`
+        if self.enable_ghi_mirroring is True:
+            return chunking.true_solar_day(
+                self._buffer['times'], self._buffer['longitude'], index)
+        return self._buffer['times'][index] // (86400 * 10**9)
+
+    def _finalize(self, day_start):
+        # classifies the records up to the last night time step whose halo ends
+        # before `day_start`, and drops the records before the halo of the next ones
+        buffer = self._buffer
+        times = buffer['times']
+        step = self._grid[1]
+        night = np.flatnonzero(~(buffer['sza'] <= self.config.max_sza))
+        night = night[night > self._classified]
+        reach = chunking.forward_reach(step, self.config)
+        night = night[times[night - 1] + reach < day_start]
+        if not night.size:
+            return _empty_result(self.full_output)
+        end = night[-1]
+
+        longitude = buffer['longitude'] if self.enable_ghi_mirroring is True else None
+        hi = chunking.halo_end(
+            times, self._grid, end, longitude, self.enable_ghi_mirroring, self.config)
+        result = _classify_buffer(
+            buffer.head(hi), self._classified, end, self._grid, self.enable_ghi_mirroring,
+            self.full_output, self.cleaning_pipeline, self.config, self._unit
+        )
+
+        lo = chunking.halo_start(
+            times, self._grid, end, longitude, self.enable_ghi_mirroring, self.config)
+        buffer.drop(lo)
+        self._classified = end - lo
+        logger.debug(f'{len(buffer)} records kept in the buffer')
+        return result
+
+
+class ProvisionalClassifier(StreamingClassifier):
+    """
+    Online classification with low latency: each record gets a provisional sky
+    type as soon as it is pushed, which is revised later on if its final sky type
+    (as in StreamingClassifier) turns out to be different.
+
+    The provisional sky types come from the thresholds of the variability indices
+    in trailing time windows, (t - dt, t] instead of (t - dt/2, t + dt/2], without
+    ghi mirroring nor cleaning filters, since they only take the past data. The
+    revision statistics tell how often they were wrong (see revision_stats).
+
+    enable_ghi_mirroring, cleaning_pipeline, config:
+      as in StreamingClassifier, for the final sky types. The provisional ones
+      take the windows and thresholds of the config
+
+    Usage:
+
+        classifier = ProvisionalClassifier()
+        for records in feed:  # DataFrames with the columns required by classify
+            events = classifier.push(records)
+            ...
+        events = classifier.flush()
+        print(classifier.revision_stats())
+    """
+
+    def __init__(self, enable_ghi_mirroring=True, cleaning_pipeline=None, config=None):
+        super().__init__(enable_ghi_mirroring, False, cleaning_pipeline, config)
+        # number of final sky types (columns) for each provisional one (rows)
+        n_labels = max(SkyType) + 1
+        self._revisions = np.zeros((n_labels, n_labels), dtype=np.int64)
+
+    def _reset(self):
+        super()._reset()
+        self._pending = _SlidingBuffer(['times', 'sky_type'])  # not final yet
+
+    def push(self, data):
+        """
+        Appends the records in `data` (a Pandas DataFrame with the columns
+        required by `classify`, in time order) and returns a Pandas DataFrame of
+        events, indexed by the UTC time stamps, with the columns `sky_type` and
+        `revision`: the provisional sky types of the records in `data` (revision
+        is False), followed by the revised sky types of the records that became
+        final (revision is True), which may be in `data` too. Hence, the last
+        event of each time stamp has its latest sky type
+        """
+        n_records = self._append(data)
+        if not n_records:
+            return _events()
+
+        provisional = self._provisional(n_records)
+        times = self._buffer['times'][-n_records:]
+        self._pending.append({'times': times, 'sky_type': provisional})
+
+        final = self._finalize_due() if self._grid is not None else None
+        revised_times, revised = self._revise(final, self._pending)
+        return _events(
+            np.r_[times, revised_times], np.r_[provisional, revised], n_records)
+
+    def flush(self):
+        """
+        Returns the events with the revised sky types of all the records that
+        are not final yet, as if the time series ended with the last record, and
+        resets the classifier (but not the revision statistics)
+        """
+        pending = self._pending
+        return _events(*self._revise(super().flush(), pending))
+
+    def revision_stats(self):
+        """
+        Returns a Pandas DataFrame with the number of provisional sky types of each
+        class (index) that are final (`n_labels`), how many of them were revised
+        (`n_revised`) and their fraction (`revised_fraction`)
+        """
+        sky_types = list(SkyType.skip_unknown())
+        counts = self._revisions[sky_types]
+        n_labels = counts.sum(axis=1)
+        n_revised = n_labels - counts[np.arange(len(sky_types)), sky_types]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = n_revised / n_labels
+        return pd.DataFrame(
+            index=pd.Index([sky_type.name for sky_type in sky_types], name='sky_type'),
+            data={'n_labels': n_labels, 'n_revised': n_revised,
+                  'revised_fraction': fraction}
+        )
+
+    def _provisional(self, n_records):
+        # provisional sky types of the last `n_records` records of the buffer,
+        # whose trailing windows go back up to two windows before them
+        buffer = self._buffer
+        times = buffer['times']
+        window, window_f = self.config.window, self.config.window_f
+        lo = np.searchsorted(
+            times, times[-n_records] - 2 * max(window, window_f), side='right')
+        times, sza, ghi, ghics, ghicda = (
+            buffer[name][lo:] for name in ('times', 'sza', 'ghi', 'ghics', 'ghicda'))
+
+        mean_ghi, Kv, Kvf = kernels.trailing_variability_indices(times, ghi, window, window_f)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            Km = np.where(sza <= self.config.max_sza, mean_ghi / ghicda, np.nan).clip(0.)
+        sky_type = _threshold(sza, ghi, ghics, Km, Kv, Kvf, self.config)[-n_records:]
+        sky_type[np.isnan(ghi[-n_records:])] = SkyType.UNKNOWN
+        return sky_type
+
+    def _revise(self, final, pending):
+        # compares the final sky types (if any) with the provisional ones of the
+        # same records, which are the oldest pending ones, and returns the time
+        # stamps and final sky types of the revised ones
+        if final is None or not len(final):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        n_final = len(final)
+        times = pending['times'][:n_final]
+        provisional = pending['sky_type'][:n_final]
+        final = final.to_numpy()
+        np.add.at(self._revisions, (provisional, final), 1)
+        revised = provisional != final
+        times, final = times[revised], final[revised]
+        pending.drop(n_final)
+        return times, final
+
+
+class _SlidingBuffer:
+    # columns of float64/int64 values in preallocated arrays, which are appended
+    # at the end and dropped from the start in amortized O(1) time per value
+
+    def __init__(self, names, capacity=4096):
+        self._names = names
+        self._data = None
+        self._capacity = capacity
+        self._start = self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, name):
+        return self._data[name][self._start:self._stop]
+
+    def head(self, stop):
+        # the first `stop` values of all the columns
+        return {name: self[name][:stop] for name in self._names}
+
+    def append(self, values):
+        n_values = len(values['times'])
+        if self._data is None:
+            self._data = {
+                name: np.empty(self._capacity, dtype=np.asarray(values[name]).dtype)
+                for name in self._names
+            }
+        if self._stop + n_values > self._capacity:
+            # move the values to the start, and grow the arrays if still needed
+            size = len(self)
+            capacity = max(self._capacity, 2 * (size + n_values))
+            for name in self._names:
+                column = np.empty(capacity, dtype=self._data[name].dtype)
+                column[:size] = self[name]
+                self._data[name] = column
+            self._capacity = capacity
+            self._start, self._stop = 0, size
+        for name in self._names:
+            self._data[name][self._stop:self._stop + n_values] = values[name]
+        self._stop += n_values
+
+    def drop(self, n_values):
+        # drops the first `n_values` values of all the columns
+        self._start += n_values
@@ -0,0 +1,229 @@
+import dataclasses
+import itertools
+import types
+
+import numpy as np
+import pandas as pd
+
+from loguru import logger
+
+from .classifier import REQUIRED, _check_variables, _clean, _prepare, _threshold, _window_indices
+from .config import ClassifierConfig, resolve_config
+from .skytype import SkyType
+
+
+logger.disable(__name__)
+
+
+# settings of the config on which the variability indices depend
+INDEX_SETTINGS = ('max_sza', 'dt', 'dt_f')
+
+
+def config_grid(base=None, **values):
+    """
+    List of configs with all the combinations of the `values` of their fields,
+    with the rest of the fields as in the config `base` (by default, the current
+    options). For instance:
+
+        configs = config_grid(cloudless_max_kv=[0.02, 0.03, 0.04],
+                              overcast_max_km=[0.25, 0.30, 0.35])
+    """
+    base = resolve_config(base)
+    names = list(values)
+    return [
+        base.replace(**dict(zip(names, combination)))
+        for combination in itertools.product(*values.values())
+    ]
+
+
+class VariabilityIndices:
+    """
+    Variability indices of a time series (Km, Kv and Kvf), computed once to
+    classify the series with many sets of thresholds and cleaning filters (e.g.,
+    to calibrate the thresholds for a new climate).
+
+    The indices only depend on the ghi mirroring and on the windows and max_sza of
+    the config (see INDEX_SETTINGS), so that `classify` and `sweep` take any config
+    with the same ones. The sky types are the same as those of caelus.classify
+    with each config.
+
+    Usage:
+
+        indices = VariabilityIndices.from_data(data)
+        configs = config_grid(cloudless_max_kv=[0.02, 0.03, 0.04])
+        frequencies = indices.sweep(configs, output='frequencies')
+    """
+
+    def __init__(self, times, sza, ghi, ghics, Km, Kv, Kvf, config, index=None):
+        self.times = times
+        self.sza = sza
+        self.ghi = ghi
+        self.ghics = ghics
+        self.Km = Km
+        self.Kv = Kv
+        self.Kvf = Kvf
+        self.config = config
+        self.index = index
+
+    @classmethod
+    def from_data(cls, data, enable_ghi_mirroring=True, config=None):
+        """
+        Indices of the time series in the DataFrame `data`, as in caelus.classify
+        """
+        _check_variables(data.columns, enable_ghi_mirroring)
+
+        longitude = data['longitude'].to_numpy() if 'longitude' in data.columns else None
+        indices = cls.from_arrays(
+            data.index.values, *[data[name].to_numpy() for name in REQUIRED],
+            longitude=longitude, enable_ghi_mirroring=enable_ghi_mirroring, config=config
+        )
+        indices.index = data.index
+        return indices
+
+    @classmethod
+    def from_windows(cls, data, dt, dt_f, enable_ghi_mirroring=True, config=None):
+        """
+        Indices of the time series in the DataFrame `data` for all the combinations
+        of the window lengths in `dt` (mean ghi and Kv) and `dt_f` (Kvf), e.g.,
+        ['20min', '30min', '40min'], to study the sensitivity to the windows. The
+        ghi mirroring is done once, and the windows in `dt_f` share the absolute
+        differences of the ghi fluctuations (see kernels.multi_window_indices).
+
+        Returns a dict with the VariabilityIndices of each (dt, dt_f), whose config
+        is `config` (by default, the current options) with those windows. The indices
+        are the same as those of caelus.classify with the same config.
+        """
+        _check_variables(data.columns, enable_ghi_mirroring)
+
+        config = resolve_config(config)
+        configs = {
+            (dt_, dt_f_): config.replace(dt=dt_, dt_f=dt_f_)
+            for dt_, dt_f_ in itertools.product(dt, dt_f)
+        }
+        longitude = data['longitude'].to_numpy() if 'longitude' in data.columns else None
+        times, sza, _, ghi, ghics, ghicda, longitude, unit = _prepare(
+            data.index.values, *[data[name].to_numpy() for name in REQUIRED],
+            longitude, enable_ghi_mirroring
+        )
+
+        indices = _window_indices(
+            times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, config.max_sza,
+            sorted({config.window for config in configs.values()}),
+            sorted({config.window_f for config in configs.values()}), unit=unit
+        )
+        return {
+            key: cls(times, sza, ghi, ghics,
+                     *indices[config.window, config.window_f], config, data.index)
+            for key, config in configs.items()
+        }
+
+    @classmethod
+    def from_arrays(cls, times, sza, eth, ghi, ghics, ghicda, longitude=None,
+                    enable_ghi_mirroring=True, config=None):
+        """
+        Indices of the time series in the arrays, as in caelus.classify_array
+        """
+        config = resolve_config(config)
+        times, sza, _, ghi, ghics, ghicda, longitude, unit = _prepare(
+            times, sza, eth, ghi, ghics, ghicda, longitude, enable_ghi_mirroring)
+        indices = _window_indices(
+            times, sza, ghi, ghicda, longitude, enable_ghi_mirroring, config.max_sza,
+            [config.window], [config.window_f], unit=unit
+        )
+        return cls(
+            times, sza, ghi, ghics, *indices[config.window, config.window_f], config)
+
+    def classify(self, config=None, cleaning_pipeline=None):
+        """
+        Sky types (int64 array) with the thresholds and cleaning filters of the
+        config `config` (by default, the config of the indices) or, if given, the
+        cleaning filters in `cleaning_pipeline`
+        """
+        config = self.config if config is None else self._check(config)
+        sky_type = _threshold(
+            self.sza, self.ghi, self.ghics, self.Km, self.Kv, self.Kvf, config)
+        return self._clean(sky_type, config, cleaning_pipeline)
+
+    def sweep(self, configs, output='labels', cleaning_pipeline=None, batch_size=16):
+        """
+        Classifies the series with each of the `configs` (e.g., from config_grid).
+        The thresholds are evaluated in batches of `batch_size` configs at once,
+        and then the cleaning filters of each config (or those in
+        `cleaning_pipeline`) are run.
+
+        output: str
+          `labels` returns a Pandas DataFrame with the sky types of each config
+          (columns, in the order of `configs`) and time step (rows).
+          `frequencies` returns a Pandas DataFrame with the relative frequency of
+          each sky type (columns) for each config (rows), out of the time steps
+          whose sky type is known. The rows are indexed by the fields that differ
+          among the configs (e.g., cloudless_max_kv), in the order of `configs`
+        """
+        if output not in ('labels', 'frequencies'):
+            raise ValueError(f'unknown output {output!r}: use `labels` or `frequencies`')
+        configs = [self._check(config) for config in configs]
+
+        results = []
+        for first in range(0, len(configs), batch_size):
+            batch = configs[first:first + batch_size]
+            logger.info(f'configs {first} to {first + len(batch) - 1}')
+            sky_types = _threshold(
+                self.sza, self.ghi, self.ghics, self.Km, self.Kv, self.Kvf,
+                _stack(batch)
+            )
+            for config, sky_type in zip(batch, sky_types):
+                sky_type = self._clean(sky_type, config, cleaning_pipeline)
+                if output == 'frequencies':
+                    sky_type = np.bincount(sky_type, minlength=max(SkyType) + 1)
+                results.append(sky_type)
+
+        if output == 'frequencies':
+            known = [sky_type.value for sky_type in SkyType.skip_unknown()]
+            counts = np.array(results).reshape(-1, max(SkyType) + 1)[:, known]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                frequencies = counts / counts.sum(axis=1, keepdims=True)
+            return pd.DataFrame(
+                index=_config_index(configs),
+                data=frequencies,
+                columns=[sky_type.name for sky_type in SkyType.skip_unknown()]
+            )
+
+        index = self.index if self.index is not None else pd.DatetimeIndex(self.times)
+        return pd.DataFrame(
+            index=index, data=dict(enumerate(results)), columns=range(len(configs)))
+
+    def _clean(self, sky_type, config, cleaning_pipeline):
+        return _clean(
+            sky_type, self.times, self.sza, self.ghi, self.Km, self.Kv, self.Kvf,
+            cleaning_pipeline, config
+        )
+
+    def _check(self, config):
+        if not isinstance(config, ClassifierConfig):
+            raise TypeError(f'expected a ClassifierConfig, got {config!r}')
+        if any(getattr(config, name) != getattr(self.config, name)
+               for name in INDEX_SETTINGS):
+            raise ValueError(
+                f'the config must have the same {", ".join(INDEX_SETTINGS)} as the '
+                'config of the indices')
+        return config
+
+
+def _config_index(configs):
+    # index of the rows of the configs: the fields that differ among them (e.g.,
+    # those of config_grid), or their position if all of them are the same
+    fields = pd.DataFrame([dataclasses.asdict(config) for config in configs])
+    varying = [name for name in fields.columns if fields[name].nunique() > 1]
+    if not varying:
+        return pd.RangeIndex(len(configs), name='config')
+    return fields.set_index(varying).index
+
+
+def _stack(configs):
+    # the thresholds of `configs` as column arrays, for classifier._threshold
+    stacked = {
+        field.name: np.array([getattr(config, field.name) for config in configs])[:, None]
+        for field in dataclasses.fields(ClassifierConfig)
+        if field.name not in INDEX_SETTINGS
+    }
+    return types.SimpleNamespace(max_sza=configs[0].max_sza, **stacked)
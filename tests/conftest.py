@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+# the synthetic time series of the benchmarks
+sys.path.insert(0, str(Path(__file__).parents[1] / 'benchmarks'))
+
+from common import synthetic_data  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def data():
+    return synthetic_data(days=60, seed=10)
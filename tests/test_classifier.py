@@ -0,0 +1,18 @@
+import pytest
+
+import caelus
+
+
+@pytest.mark.parametrize('entry_point', [
+    caelus.classify,
+    caelus.Classifier().classify,
+    caelus.VariabilityIndices.from_data,
+    lambda data: caelus.classify_many([data]),
+    lambda data: list(caelus.iter_classify([data])),
+    caelus.StreamingClassifier().push,
+])
+def test_missing_variables(data, entry_point):
+    with pytest.raises(ValueError, match='missing required variables: eth, ghics'):
+        entry_point(data.drop(columns=['ghics', 'eth']))
+    with pytest.raises(ValueError, match='missing required variable: longitude'):
+        entry_point(data.drop(columns='longitude'))
@@ -0,0 +1,73 @@
+"""
+The serial engine of caelus against the original classifier (tests/reference.py):
+the same sky types and the same variability indices, to the last bit
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import caelus
+
+from common import synthetic_data
+
+reference = pytest.importorskip('reference', reason='the reference classifier needs scipy')
+
+# the reference shifts the sky types with an integer fill value, deprecated in pandas
+pytestmark = pytest.mark.filterwarnings('ignore:shifting with a fill value')
+
+
+def assert_identical(result, expected):
+    assert result.index.equals(expected.index)
+    for name in ('sky_type', 'Km', 'Kv', 'Kvf'):
+        np.testing.assert_array_equal(
+            result[name].to_numpy(dtype=np.float64), expected[name].to_numpy(dtype=np.float64),
+            err_msg=name)
+
+
+@pytest.mark.parametrize('enable_ghi_mirroring', [True, False])
+def test_classify(data, enable_ghi_mirroring):
+    assert_identical(
+        caelus.classify(data, enable_ghi_mirroring, full_output=True),
+        reference.classify(data, enable_ghi_mirroring, full_output=True))
+
+
+@pytest.mark.parametrize('variant', ['irregular', 'gaps', 'ns', 's'])
+def test_classify_variants(data, variant):
+    if variant == 'irregular':
+        data = data.loc[np.random.default_rng(0).random(len(data)) > 0.03]
+    elif variant == 'gaps':
+        data = data.drop(data.index[5000:9000])
+    else:
+        data = data.set_axis(data.index.astype(f'datetime64[{variant}]'))
+    assert_identical(
+        caelus.classify(data, full_output=True), reference.classify(data, full_output=True))
+
+
+def test_classify_30s():
+    data = synthetic_data(days=20, freq='30s', latitude=-35., longitude=150., seed=3)
+    assert_identical(
+        caelus.classify(data, full_output=True), reference.classify(data, full_output=True))
+
+
+def test_classify_array(data):
+    required = ['sza', 'eth', 'ghi', 'ghics', 'ghicda']
+    result = caelus.classify_array(
+        data.index.values, *[data[name].to_numpy() for name in required],
+        longitude=data['longitude'].to_numpy(), full_output=True)
+    assert_identical(
+        pd.DataFrame(index=data.index, data=result), reference.classify(data, full_output=True))
+
+
+@pytest.mark.parametrize('enable_ghi_mirroring', [True, False])
+def test_classify_panel(enable_ghi_mirroring):
+    sites = [(10., 10.), (40., -80.), (-30., 20.)]
+    frames = [synthetic_data(days=15, latitude=latitude, longitude=longitude, seed=seed)
+              for seed, (latitude, longitude) in enumerate(sites)]
+    sky_type = caelus.classify_panel(
+        frames[0].index.values,
+        **{name: np.array([data[name].to_numpy() for data in frames])
+           for name in ('sza', 'eth', 'ghi', 'ghics', 'ghicda')},
+        longitude=np.array([longitude for _, longitude in sites]),
+        enable_ghi_mirroring=enable_ghi_mirroring)
+    expected = [reference.classify(data, enable_ghi_mirroring).to_numpy() for data in frames]
+    np.testing.assert_array_equal(sky_type, np.array(expected))
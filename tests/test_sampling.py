@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import caelus
+
+
+def test_regularize_keeps_the_grid_phase(data):
+    # 1-min data at the 30th second of each minute, with a gap
+    data = data.drop(data.index[5000:5100])
+    assert (data.index.second == 30).all()
+    for label in ('left', 'right'):
+        result = caelus.regularize(data, label=label)
+        assert (result.index.second == 30).all()
+        pd.testing.assert_frame_equal(result.reindex(data.index), data)
+        assert result.iloc[5000:5100].isna().all().all()
+
+    pd.testing.assert_series_equal(
+        caelus.classify(data, regularize=True).reindex(data.index), caelus.classify(data))
+
+
+def test_regularize_on_whole_minutes(data):
+    # 30-s data are averaged on whole minutes
+    times = data.index[:120].repeat(2) + np.tile(pd.to_timedelta([0, 30], 's'), 120)
+    ghi = pd.DataFrame(index=times, data={'ghi': np.arange(240.)})
+    result = caelus.regularize(ghi)
+    assert (result.index.second == 0).all()
+    np.testing.assert_array_equal(result['ghi'].to_numpy()[1:3], [1.5, 3.5])
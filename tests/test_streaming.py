@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import caelus
+
+
+def batches(data, size):
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1000, 1440, 5000])
+def test_provisional_latest_events(data, size):
+    # the last event of each time stamp is its final sky type, even when the
+    # records become final in the same push that brings them
+    classifier = caelus.ProvisionalClassifier()
+    events = pd.concat(
+        [classifier.push(records) for records in batches(data, size)] + [classifier.flush()])
+
+    streaming = caelus.StreamingClassifier()
+    final = pd.concat(
+        [streaming.push(records) for records in batches(data, size)] + [streaming.flush()])
+
+    provisional = events.loc[~events['revision'], 'sky_type']
+    assert provisional.index.equals(data.index)
+    latest = events.groupby(level=0)['sky_type'].last()
+    np.testing.assert_array_equal(latest.to_numpy(), final.to_numpy())
+    assert events['revision'].sum() == classifier.revision_stats()['n_revised'].sum()
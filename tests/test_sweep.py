@@ -0,0 +1,22 @@
+import numpy as np
+
+import caelus
+from caelus.skytype import SkyType
+
+
+def test_frequencies_by_config(data):
+    indices = caelus.VariabilityIndices.from_data(data)
+    configs = caelus.config_grid(cloudless_max_kv=[0.02, 0.04], overcast_max_km=[0.25, 0.35])
+    frequencies = indices.sweep(configs, output='frequencies')
+
+    assert frequencies.index.names == ['overcast_max_km', 'cloudless_max_kv']
+    for config in configs[1:3]:
+        sky_type = indices.classify(config)
+        counts = np.bincount(sky_type, minlength=max(SkyType) + 1)[2:]
+        expected = counts / counts.sum()
+        np.testing.assert_allclose(
+            frequencies.loc[(config.overcast_max_km, config.cloudless_max_kv)], expected)
+
+    frequencies = indices.sweep([indices.config], output='frequencies')
+    assert list(frequencies.index) == [0] and frequencies.index.name == 'config'
+